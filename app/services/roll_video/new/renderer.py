@@ -25,6 +25,11 @@ import psutil
 import types  # 添加types模块导入
 import multiprocessing
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
 logger = logging.getLogger(__name__)
 
 try:
@@ -67,9 +72,68 @@ try:
             for x in range(w):
                 for c in range(source.shape[2]):
                     target[y, x, c] = source[y, x, c]
-        
+
         return target
-    
+
+    # JIT优化的批量滚动帧合成函数（uint8整数运算，平面格式）
+    @jit(nopython=True, parallel=True, fastmath=True, cache=True)
+    def composite_scroll_frames_batch(src_planes, bg_planes, out, starts):
+        """
+        使用Numba批量合成多帧滚动画面，输入输出均为平面(SoA)格式，
+        每个通道按行连续存储，内层循环可向量化
+
+        Args:
+            src_planes: 源图像平面数据 (4, H, W, uint8)，通道顺序RGBA
+            bg_planes: 背景平面数据 (3, H, W, uint8)，通道顺序GBR (FFmpeg gbrp)
+            out: 输出帧缓冲区 (N, 3, H, W, uint8)，通道顺序GBR
+            starts: 每帧在源图像中的起始行 (N, int64)
+
+        Returns:
+            输出帧缓冲区
+        """
+        n = starts.shape[0]
+        out_h = out.shape[2]
+        out_w = out.shape[3]
+        src_h = src_planes.shape[1]
+        w = min(src_planes.shape[2], out_w)
+
+        # 并行处理所有帧的所有行
+        for k in prange(n * out_h):
+            i = k // out_h
+            y = k % out_h
+            sy = starts[i] + y
+            if sy < src_h:
+                for c in range(3):
+                    # GBR输出平面对应的RGBA源通道: G<-1, B<-2, R<-0
+                    sc = (c + 1) % 3
+                    for x in range(w):
+                        a = np.uint32(src_planes[3, sy, x])
+                        out[i, c, y, x] = (
+                            np.uint32(src_planes[sc, sy, x]) * a
+                            + np.uint32(bg_planes[c, y, x]) * (np.uint32(255) - a)
+                            + np.uint32(127)
+                        ) // np.uint32(255)
+                    # 源图像较窄时，剩余列使用背景
+                    for x in range(w, out_w):
+                        out[i, c, y, x] = bg_planes[c, y, x]
+            else:
+                # 超出源图像的行使用背景
+                for c in range(3):
+                    for x in range(out_w):
+                        out[i, c, y, x] = bg_planes[c, y, x]
+
+        return out
+
+    def limit_numba_threads():
+        """
+        未显式设置NUMBA_NUM_THREADS时，为系统和FFmpeg编码预留2个核心，避免并行线程争用
+
+        numba.set_num_threads只对调用它的线程生效，须在运行并行内核的线程中调用
+        """
+        if 'NUMBA_NUM_THREADS' not in os.environ:
+            from numba import config as numba_config, set_num_threads
+            set_num_threads(max(1, min(numba_config.NUMBA_NUM_THREADS, (os.cpu_count() or 1) - 2)))
+
     NUMBA_AVAILABLE = True
     logger.info("Numba JIT编译支持已启用，性能将显著提升")
 except ImportError:
@@ -84,10 +148,52 @@ except ImportError:
         w = min(source.shape[1], max_w)
         target[:h, :w] = source[:h, :w]
         return target
-    
+
+    def composite_scroll_frames_batch(src_planes, bg_planes, out, starts):
+        """普通的批量滚动帧合成（无Numba，平面格式，uint16整数运算）"""
+        src_h = src_planes.shape[1]
+        out_h = out.shape[2]
+        w = min(src_planes.shape[2], out.shape[3])
+        for i, y0 in enumerate(starts):
+            y0 = int(y0)
+            h = max(0, min(y0 + out_h, src_h) - y0)
+            out[i, :, h:] = bg_planes[:, h:]
+            out[i, :, :h, w:] = bg_planes[:, :h, w:]
+            if h > 0:
+                a = src_planes[3, y0:y0 + h, :w].astype(np.uint16)
+                src = src_planes[[1, 2, 0], y0:y0 + h, :w]
+                out[i, :, :h, :w] = (src * a + bg_planes[:, :h, :w] * (255 - a) + 127) // 255
+        return out
+
+    def limit_numba_threads():
+        """无Numba时无需限制线程数"""
+
     NUMBA_AVAILABLE = False
     logger.warning("Numba未安装，将使用标准Python函数。安装Numba可大幅提升性能：pip install numba")
 
+
+def _enlarge_pipe_buffer(fd):
+    """
+    在Linux上把管道容量扩大到系统允许的最大值（默认仅64KiB），
+    使整帧写入不必等待FFmpeg读取上百次
+
+    Args:
+        fd: 管道写端的文件描述符
+    """
+    if fcntl is None or platform.system() != "Linux":
+        return
+    try:
+        with open("/proc/sys/fs/pipe-max-size") as f:
+            size = int(f.read().strip())
+    except (OSError, ValueError):
+        size = 1 << 20
+    try:
+        # F_SETPIPE_SZ 在 Python 3.10 之前未导出，值为1031
+        fcntl.fcntl(fd, getattr(fcntl, "F_SETPIPE_SZ", 1031), size)
+    except OSError as e:
+        logger.debug(f"设置管道容量失败: {e}")
+
+
 class TextRenderer:
     """文字渲染器，负责将文本渲染成图片"""
     
@@ -283,7 +389,10 @@ class TextRenderer:
 class VideoRenderer:
     """视频渲染器，负责生成滚动效果视频"""
     
-    def __init__(self, width, height, fps=30, output_path=None, frame_skip=1, scale_factor=1.0, with_audio=False, audio_path=None, transparent=False, error_callback=None, max_threads=None):
+    # FFmpeg是否支持h264_nvenc，进程内只探测一次
+    _nvenc_available = None
+    
+    def __init__(self, width, height, fps=30, output_path=None, frame_skip=1, scale_factor=1.0, with_audio=False, audio_path=None, transparent=False, error_callback=None, max_threads=None, planar=False, encoder='auto'):
         """初始化视频渲染器"""
         # 视频参数
         self.width = int(width)
@@ -293,9 +402,18 @@ class VideoRenderer:
         self.transparent = bool(transparent)
         self.output_path = output_path
         
+        # 输入像素格式: 透明为rgba；不透明时平面帧(3, H, W, GBR顺序)使用gbrp，否则rgb24
+        if self.transparent:
+            self.input_pix_fmt = 'rgba'
+        else:
+            self.input_pix_fmt = 'gbrp' if planar else 'rgb24'
+        
         # 跳帧设置
         self.skip_frames = max(1, int(frame_skip))
         
+        # 编码器选择: 'auto' (有NVENC时使用GPU), 'nvenc', 'libx264'
+        self.encoder = encoder
+        
         # 音频设置
         self.with_audio = with_audio
         self.audio_path = audio_path
@@ -347,6 +465,7 @@ class VideoRenderer:
         self._frame_queue = queue.Queue(maxsize=self.frame_queue_size)
         self._last_frame_processed = -1
         self._last_frame_lock = threading.Lock()
+        self._constant_tail = None  # (起始帧索引, 帧数据)，尾部恒定帧由写入线程批量写出
         self._error = multiprocessing.Value('i', 0)
         self.stop_threads = False  # 为兼容性保留
         
@@ -404,14 +523,16 @@ class VideoRenderer:
         """帧生成线程工作函数"""
         # 为每个工作线程分配不同的帧区域
         thread_count = self.max_threads
-        frames_per_thread = self.total_frames // thread_count
+        # 恒定尾帧不需要逐帧生成
+        generate_frames = self._constant_tail[0] if self._constant_tail is not None else self.total_frames
+        frames_per_thread = generate_frames // thread_count
         start_frame = thread_id * frames_per_thread
-        end_frame = (thread_id + 1) * frames_per_thread if thread_id < thread_count - 1 else self.total_frames
+        end_frame = (thread_id + 1) * frames_per_thread if thread_id < thread_count - 1 else generate_frames
         
         # 预填充阶段：所有线程协作处理前n帧
         # 多线程同时填充，但仅第一个线程处理前几帧
         if thread_id == 0:
-            prefill_end = min(self.prefill_count, self.total_frames)
+            prefill_end = min(self.prefill_count, generate_frames)
             # 优先处理开头部分帧
             for frame_idx in range(min(prefill_end, end_frame)):
                 if self._event_stop.is_set():
@@ -511,8 +632,9 @@ class VideoRenderer:
                     stdin=subprocess.PIPE,
                     stdout=subprocess.DEVNULL,
                     stderr=subprocess.PIPE,
-                    bufsize=10 * 1024 * 1024  # 10MB缓冲区
+                    bufsize=1 << 20  # 1MB缓冲区
                 )
+                _enlarge_pipe_buffer(ffmpeg_process.stdin.fileno())
                 logger.info("FFmpeg进程已启动")
             except Exception as e:
                 logger.error(f"启动FFmpeg进程失败: {str(e)}")
@@ -524,6 +646,10 @@ class VideoRenderer:
             consecutive_errors = 0
             max_consecutive_errors = 5
             
+            # 小帧合并写入缓冲区，凑满约4MB再写入管道，减少系统调用次数
+            write_chunk_size = 4 * 1024 * 1024
+            pending_writes = bytearray()
+            
             # 记录开始时间
             start_time = time.time()
             next_log_time = start_time + 10  # 每10秒记录一次进度
@@ -642,8 +768,9 @@ class VideoRenderer:
                                     stdin=subprocess.PIPE,
                                     stdout=subprocess.DEVNULL,
                                     stderr=subprocess.PIPE,
-                                    bufsize=10 * 1024 * 1024
+                                    bufsize=1 << 20
                                 )
+                                _enlarge_pipe_buffer(ffmpeg_process.stdin.fileno())
                                 logger.info("FFmpeg进程已重启")
                             except Exception as e:
                                 logger.error(f"重启FFmpeg进程失败: {str(e)}")
@@ -667,12 +794,12 @@ class VideoRenderer:
                                     # 如果是字节对象，直接使用
                                     if isinstance(frame_data, bytes):
                                         frame_bytes = frame_data
-                                    # 如果是PIL图像或NumPy数组，转换为字节
+                                    # 如果是NumPy数组，直接写入其内存缓冲区，避免tobytes()额外复制
+                                    elif isinstance(frame_data, np.ndarray):
+                                        frame_bytes = memoryview(np.ascontiguousarray(frame_data)).cast('B')
+                                    # 如果是PIL图像，转换为字节
                                     elif hasattr(frame_data, 'tobytes'):
                                         frame_bytes = frame_data.tobytes()
-                                    # 如果是NumPy数组，需要确保内存连续
-                                    elif hasattr(frame_data, 'copy') and hasattr(frame_data, 'tobytes'):
-                                        frame_bytes = frame_data.copy(order='C').tobytes()
                                     # 其他情况下跳过这一帧
                                     else:
                                         logger.warning(f"未知帧数据类型: {type(frame_data)}")
@@ -680,8 +807,17 @@ class VideoRenderer:
                                     
                                     # 写入FFmpeg进程
                                     if ffmpeg_process and ffmpeg_process.poll() is None:  # 确保进程仍在运行
-                                        ffmpeg_process.stdin.write(frame_bytes)
-                                        ffmpeg_process.stdin.flush()
+                                        if len(frame_bytes) >= write_chunk_size:
+                                            # 大帧直接写入，避免额外复制
+                                            if pending_writes:
+                                                ffmpeg_process.stdin.write(pending_writes)
+                                                pending_writes.clear()
+                                            ffmpeg_process.stdin.write(frame_bytes)
+                                        else:
+                                            pending_writes += frame_bytes
+                                            if len(pending_writes) >= write_chunk_size:
+                                                ffmpeg_process.stdin.write(pending_writes)
+                                                pending_writes.clear()
                                         frames_written += 1
                                         consecutive_errors = 0  # 重置错误计数
                                         
@@ -714,6 +850,7 @@ class VideoRenderer:
                             except BrokenPipeError as e:
                                 # 管道已断开，需要重启FFmpeg
                                 logger.error(f"写入FFmpeg失败: {str(e)}")
+                                pending_writes.clear()
                                 consecutive_errors += 1
                                 
                                 if consecutive_errors < max_consecutive_errors:
@@ -761,8 +898,9 @@ class VideoRenderer:
                                             stdin=subprocess.PIPE,
                                             stdout=subprocess.DEVNULL,
                                             stderr=subprocess.PIPE,
-                                            bufsize=10 * 1024 * 1024
+                                            bufsize=1 << 20
                                         )
+                                        _enlarge_pipe_buffer(ffmpeg_process.stdin.fileno())
                                         logger.info("FFmpeg进程已重启")
                                         
                                         # 跳出当前帧的处理，从下一帧开始重试
@@ -799,7 +937,7 @@ class VideoRenderer:
                                             '-f', 'rawvideo',
                                             '-vcodec', 'rawvideo',
                                             '-s', f'{self.width}x{self.height}',
-                                            '-pix_fmt', 'rgb24',
+                                            '-pix_fmt', self.input_pix_fmt,
                                             '-r', str(self.fps),
                                             '-i', 'pipe:',
                                             '-c:v', 'libx264',
@@ -816,8 +954,9 @@ class VideoRenderer:
                                             stdin=subprocess.PIPE,
                                             stdout=subprocess.DEVNULL,
                                             stderr=subprocess.PIPE,
-                                            bufsize=10 * 1024 * 1024
+                                            bufsize=1 << 20
                                         )
+                                        _enlarge_pipe_buffer(ffmpeg_process.stdin.fileno())
                                         logger.info("已启动最简单的FFmpeg进程进行最后尝试")
                                         
                                         # 继续处理
@@ -850,6 +989,21 @@ class VideoRenderer:
             # Keep this summary log
             logger.info(f"帧写入主循环已结束. Final loop count: {loop_counter}. Stop event: {self._event_stop.is_set()}, Queue empty: {self._frame_queue.empty()}")
 
+            # 写出剩余的合并缓冲区
+            if pending_writes and ffmpeg_process and ffmpeg_process.poll() is None:
+                try:
+                    ffmpeg_process.stdin.write(pending_writes)
+                except (BrokenPipeError, OSError) as e:
+                    logger.error(f"写入剩余帧数据失败: {str(e)}")
+                    self._error.value = 1
+                pending_writes.clear()
+
+            # 批量写出恒定尾帧
+            if self._constant_tail is not None and self._error.value == 0 and ffmpeg_process and ffmpeg_process.poll() is None:
+                tail_written = self._write_constant_tail(ffmpeg_process, self.total_frames - self._constant_tail[0])
+                frames_written += tail_written
+                progress_bar.update(tail_written)
+
             # Try closing the main progress bar here
             # ... (closing progress_bar logic remains the same) ...
 
@@ -1041,6 +1195,24 @@ class VideoRenderer:
             logger.info("_frame_writer 线程即将设置完成事件并退出")
             self._event_complete.set()
 
+    def _write_constant_tail(self, ffmpeg_process, frame_count):
+        """将恒定尾帧按约1MB的块批量写入FFmpeg，返回写入的帧数"""
+        tail_frame = self._constant_tail[1]
+        frame_bytes = np.ascontiguousarray(tail_frame).tobytes()
+        frames_per_chunk = max(1, (1 << 20) // len(frame_bytes))
+        chunk = frame_bytes * frames_per_chunk
+        written = 0
+        try:
+            while written < frame_count:
+                n = min(frames_per_chunk, frame_count - written)
+                ffmpeg_process.stdin.write(chunk if n == frames_per_chunk else frame_bytes * n)
+                written += n
+            logger.info(f"已批量写入 {written} 帧恒定尾帧")
+        except (BrokenPipeError, OSError) as e:
+            logger.error(f"写入恒定尾帧失败: {str(e)}")
+            self._error.value = 1
+        return written
+
     def _should_stop_scrolling(self, frame_index):
         """判断是否应该停止滚动，避免循环播放问题"""
         # 如果已明确设置停止标记，立即停止
@@ -1093,7 +1265,7 @@ class VideoRenderer:
             '-f', 'rawvideo',                  # 输入格式
             '-vcodec', 'rawvideo',             # 输入编解码器
             '-s', f'{self.width}x{self.height}', # 视频尺寸
-            '-pix_fmt', 'rgba' if self.transparent else 'rgb24', # 像素格式
+            '-pix_fmt', self.input_pix_fmt,    # 像素格式
             '-r', str(self.fps),               # 帧率
             '-i', 'pipe:',                     # 从管道读取
         ]
@@ -1116,14 +1288,26 @@ class VideoRenderer:
                 '-pix_fmt', 'yuva444p10le'
             ])
         else:
-            # 非透明视频使用 libx264 - 使用CPU编码，更加稳定
+            # 非透明视频优先使用NVENC硬件编码，释放CPU用于帧生成
+            use_nvenc = self.encoder == 'nvenc' or (self.encoder == 'auto' and self._is_nvenc_encoder_available())
+            if use_nvenc:
                 command.extend([
-                '-c:v', 'libx264',
-                '-preset', 'ultrafast',
-                '-crf', '23',
+                    '-c:v', 'h264_nvenc',
+                    '-preset', 'p4',
+                    '-rc', 'vbr',
+                    '-cq', '23',
                     '-pix_fmt', 'yuv420p',
-                '-movflags', '+faststart'
-            ])
+                    '-movflags', '+faststart'
+                ])
+            else:
+                # 无NVENC时使用 libx264 CPU编码
+                command.extend([
+                    '-c:v', 'libx264',
+                    '-preset', 'veryfast',
+                    '-crf', '20',
+                    '-pix_fmt', 'yuv420p',
+                    '-movflags', '+faststart'
+                ])
         
         # 明确添加非循环标记 - 单独添加这个参数而不是与编码参数一起添加
         command.extend(['-loop', '0']) 
@@ -1134,6 +1318,32 @@ class VideoRenderer:
         logger.info(f"简化的FFmpeg命令: {' '.join(command)}")
         return command
 
+    @classmethod
+    def _is_nvenc_encoder_available(cls):
+        """检测NVENC是否真正可用，结果缓存在类上
+
+        ffmpeg -encoders列出h264_nvenc、lspci能看到NVIDIA显卡都不能说明编码器可用
+        （发行版FFmpeg通常都编译了NVENC，未直通GPU的容器中也能看到宿主机显卡），
+        因此用h264_nvenc试编码一帧，成功才认为可用
+        """
+        if cls._nvenc_available is None:
+            try:
+                result = subprocess.run(
+                    ['ffmpeg', '-hide_banner', '-loglevel', 'error',
+                     '-f', 'lavfi', '-i', 'color=c=black:s=256x256',
+                     '-frames:v', '1', '-c:v', 'h264_nvenc', '-f', 'null', '-'],
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    timeout=10
+                )
+                cls._nvenc_available = result.returncode == 0
+            except Exception as e:
+                logger.warning(f"检测NVENC编码器失败: {str(e)}")
+                cls._nvenc_available = False
+            logger.info(f"NVENC编码器: {'可用' if cls._nvenc_available else '不可用'}")
+        return cls._nvenc_available
+
     def _is_nvidia_available(self):
         """检测是否有可用的NVIDIA GPU"""
         try:
@@ -1324,6 +1534,15 @@ class VideoRenderer:
             self._last_frame_processed = -1
             self.stop_threads = False  # 确保兼容性
             
+            # 恒定尾帧（如文本滚出后的纯背景帧）由写入线程批量写出，无需逐帧生成
+            self._constant_tail = None
+            get_constant_tail = getattr(frame_generator, 'get_constant_tail', None)
+            if get_constant_tail is not None:
+                tail_start, tail_frame = get_constant_tail()
+                if tail_frame is not None and 0 <= tail_start < total_frames:
+                    self._constant_tail = (tail_start, tail_frame)
+                    logger.info(f"帧 {tail_start}-{total_frames - 1} 为恒定帧，将批量写入")
+            
             # 降低GC频率，减轻内存压力
             # 在极速模式下大幅提高GC阈值
             import gc
@@ -4,13 +4,22 @@ import platform
 from typing import Dict, Tuple, List, Optional, Union, Callable
 from PIL import Image, ImageFont
 import io
+import hashlib
+import tempfile
+import queue
+import threading
+from collections import OrderedDict
 import numpy as np
 
-from renderer import TextRenderer, VideoRenderer, blend_alpha_fast
+from renderer import TextRenderer, VideoRenderer, composite_scroll_frames_batch, limit_numba_threads
 
 # 配置日志
 logger = logging.getLogger(__name__)
 
+# 文本图片磁盘缓存的上限，超出后按修改时间删除最旧的缓存文件
+TEXT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+TEXT_CACHE_MAX_FILES = 64
+
 
 class RollVideoService:
     """滚动视频制作服务"""
@@ -22,8 +31,13 @@ class RollVideoService:
             os.path.dirname(os.path.abspath(__file__)), "fonts"
         )
         
+        # 缓存字体目录的文件列表，避免每次查找字体时重复扫描目录
+        self._fonts_dir_files = self._scan_fonts_dir()
+        self._font_index = {}
+        
         # 检查字体文件
         self.available_fonts = self._get_available_fonts()
+        self._font_index = self._build_font_index()
         
         # 默认使用自定义字体，如果没有则使用系统默认字体
         if self.available_fonts:
@@ -36,6 +50,31 @@ class RollVideoService:
                 f"未找到自定义字体，将使用系统默认字体: {self.default_font_path}"
             )
 
+    def _scan_fonts_dir(self) -> Tuple[str, ...]:
+        """扫描字体目录，返回文件名快照"""
+        if os.path.isdir(self.fonts_dir):
+            return tuple(os.listdir(self.fonts_dir))
+        return ()
+
+    def _build_font_index(self) -> Dict[str, str]:
+        """建立字体名称(小写，含/不含扩展名)到字体路径的索引"""
+        index = {}
+        for path in self.available_fonts:
+            base_name = os.path.basename(path).lower()
+            index.setdefault(base_name, path)
+        # 不含扩展名的名称优先级低于完整文件名
+        for path in self.available_fonts:
+            stem = os.path.splitext(os.path.basename(path))[0].lower()
+            index.setdefault(stem, path)
+        return index
+
+    def invalidate_font_cache(self) -> None:
+        """重新扫描字体目录，字体文件变更后调用"""
+        self._fonts_dir_files = self._scan_fonts_dir()
+        self._font_index = {}
+        self.available_fonts = self._get_available_fonts()
+        self._font_index = self._build_font_index()
+
     def _get_available_fonts(self, font_name: Optional[str] = None) -> List[str]:
         """
         获取可用的字体文件
@@ -59,38 +98,41 @@ class RollVideoService:
             base_name = os.path.basename(font_name)
             name_without_ext = os.path.splitext(base_name)[0]
             
+            # 优先查找预建的字体索引
+            found_font = self._font_index.get(base_name.lower()) or self._font_index.get(name_without_ext.lower())
+            if found_font:
+                logger.info(f"找到字体: {found_font}")
+                return [found_font]
+            
             # 在fonts目录中查找匹配的字体
-            if os.path.isdir(self.fonts_dir):
-                # 精确匹配（包括扩展名）
-                for file in os.listdir(self.fonts_dir):
-                    if file.lower() == base_name.lower():
-                        found_font = os.path.join(self.fonts_dir, file)
-                        logger.info(f"找到精确匹配字体: {found_font}")
-                        return [found_font]
-                
-                # 精确匹配（不包括扩展名）
-                for file in os.listdir(self.fonts_dir):
-                    file_without_ext = os.path.splitext(file)[0]
-                    if file_without_ext.lower() == name_without_ext.lower():
-                        found_font = os.path.join(self.fonts_dir, file)
-                        logger.info(f"找到字体名匹配: {found_font}")
-                        return [found_font]
+            # 精确匹配（包括扩展名）
+            for file in self._fonts_dir_files:
+                if file.lower() == base_name.lower():
+                    found_font = os.path.join(self.fonts_dir, file)
+                    logger.info(f"找到精确匹配字体: {found_font}")
+                    return [found_font]
+            
+            # 精确匹配（不包括扩展名）
+            for file in self._fonts_dir_files:
+                file_without_ext = os.path.splitext(file)[0]
+                if file_without_ext.lower() == name_without_ext.lower():
+                    found_font = os.path.join(self.fonts_dir, file)
+                    logger.info(f"找到字体名匹配: {found_font}")
+                    return [found_font]
                 
             logger.warning(f"找不到指定字体: {font_name}")
         
-        # 如果未指定字体或未找到指定字体，扫描字体目录
-        if os.path.isdir(self.fonts_dir):
-            # 优先选择方正黑体简体
-            fz_font = os.path.join(self.fonts_dir, "FangZhengHeiTiJianTi.ttf")
-            if os.path.isfile(fz_font):
-                fonts.append(fz_font)
-            
-            # 添加目录中的其他ttf/otf字体
-            for file in os.listdir(self.fonts_dir):
-                if file.lower().endswith((".ttf", ".otf", ".ttc")) and file not in [
-                    "FangZhengHeiTiJianTi.ttf",
-                ]:
-                    fonts.append(os.path.join(self.fonts_dir, file))
+        # 如果未指定字体或未找到指定字体，使用字体目录快照
+        # 优先选择方正黑体简体
+        if "FangZhengHeiTiJianTi.ttf" in self._fonts_dir_files:
+            fonts.append(os.path.join(self.fonts_dir, "FangZhengHeiTiJianTi.ttf"))
+        
+        # 添加目录中的其他ttf/otf字体
+        for file in self._fonts_dir_files:
+            if file.lower().endswith((".ttf", ".otf", ".ttc")) and file not in [
+                "FangZhengHeiTiJianTi.ttf",
+            ]:
+                fonts.append(os.path.join(self.fonts_dir, file))
         
         return fonts
 
@@ -191,6 +233,8 @@ class RollVideoService:
         char_spacing: int = 0,   # 添加字符间距参数
         respect_original_newlines: bool = True,  # 添加是否尊重原始换行参数
         error_callback: Optional[Callable[[str], None]] = None,
+        enable_text_cache: bool = True,
+        encoder: str = 'auto',
     ) -> str:
         """
         创建滚动视频，将文本从下向上滚动
@@ -215,6 +259,8 @@ class RollVideoService:
             char_spacing: 字符间距(像素)，默认0
             respect_original_newlines: 是否尊重原始文本中的换行符，默认True
             error_callback: 错误回调函数，默认None
+            enable_text_cache: 是否缓存渲染好的文本图片到磁盘，默认True
+            encoder: 不透明视频的编码器，'auto'(有NVENC时使用GPU)/'nvenc'/'libx264'，默认'auto'
         
         Returns:
             输出视频路径
@@ -261,35 +307,36 @@ class RollVideoService:
                     f"font_color={font_color}, bg_color={bg_color}, line_spacing={scaled_line_spacing}, "
                     f"char_spacing={scaled_char_spacing}")
 
-        # 初始化 TextRenderer
-        try:
-            text_renderer = TextRenderer(
-                width=scaled_width,
-                font_path=final_font_path,  # 使用确认后的路径
-                font_size=scaled_font_size,
-                font_color=font_color,
-                bg_color=bg_color,
-                line_spacing=scaled_line_spacing,
-                char_spacing=scaled_char_spacing,
-            )
-        except Exception as e:
-            logger.error(f"初始化 TextRenderer 失败，字体: {final_font_path}, 错误: {e}", exc_info=True)
-            if error_callback:
-                error_callback(f"字体加载或渲染器初始化失败: {os.path.basename(final_font_path)} - {e}")
-            # 可以根据需要决定是抛出异常还是返回错误信息
-            raise  # 重新抛出异常，以便上层捕获
+        # 查找文本图片缓存，相同参数的文本无需重新排版渲染
+        text_cache_path = None
+        cached = None
+        if enable_text_cache:
+            # 字体文件的修改时间和大小也计入缓存键，同名字体被替换后不会命中旧的图片；
+            # 没有字体文件（使用默认字体）时为None
+            font_stat = None
+            if final_font_path:
+                try:
+                    stat = os.stat(final_font_path)
+                    font_stat = (stat.st_mtime_ns, stat.st_size)
+                except OSError:
+                    pass
+            cache_key = hashlib.blake2b(repr((
+                text, final_font_path, font_stat, scaled_font_size, font_color, bg_color,
+                scaled_line_spacing, scaled_char_spacing, scaled_width, scaled_height
+            )).encode('utf-8')).hexdigest()
+            text_cache_path = os.path.join(tempfile.gettempdir(), 'rollvid_cache', cache_key + '.npz')
+            cached = self._load_text_cache(text_cache_path)
 
-        # 使用 TextRenderer 渲染文本为图片
-        try:
-            text_img, text_height = text_renderer.render_text_to_image(
-                text,
-                min_height=scaled_height # 传递缩放后的高度作为最小高度参考
+        if cached is not None:
+            text_img, text_height = cached
+            logger.info(f"命中文本图片缓存: {text_cache_path}")
+        else:
+            text_img, text_height = self._render_text_image(
+                text, final_font_path, scaled_width, scaled_height, scaled_font_size,
+                font_color, bg_color, scaled_line_spacing, scaled_char_spacing, error_callback
             )
-        except Exception as e:
-            logger.error(f"文本渲染为图片时出错: {e}", exc_info=True)
-            if error_callback:
-                error_callback(f"文本渲染失败: {e}")
-            raise # 重新抛出异常
+            if text_cache_path:
+                self._save_text_cache(text_cache_path, text_img, text_height)
             
         logger.info(f"文本图片已生成，尺寸: {text_img.size}, 文本高度: {text_height}")
 
@@ -314,6 +361,9 @@ class RollVideoService:
             audio_path=audio_path,
             transparent=transparent, # 传递透明背景选项
             error_callback=error_callback,
+            max_threads=1, # 帧由独立生产线程按顺序生成，渲染器只需单线程转发
+            planar=not transparent, # 不透明帧以平面GBR格式输出，省去交错存储
+            encoder=encoder, # 透明视频固定使用ProRes (NVENC不支持Alpha)
         )
 
         # 计算总帧数
@@ -345,30 +395,218 @@ class RollVideoService:
             video_renderer=video_renderer,# VideoRenderer实例
             scroll_speed=scaled_scroll_speed,# 渲染分辨率下的滚动速度
             scroll_frames_needed=scroll_frames_needed,# 滚动结束帧
-            bg_color=bg_color           # 用户指定的背景色RGBA
+            bg_color=bg_color,          # 用户指定的背景色RGBA
+            text_height=text_height     # 文本实际高度，用于确定纯背景尾帧
         )
 
+        # 在独立线程中生成帧，与FFmpeg编码流水线并行
+        pull_frame, producer_stop = self._threaded_frame_producer(frame_generator, total_frames)
+
         # 开始渲染视频帧
         try:
             video_renderer.render_frames(
                 total_frames=total_frames,
-                frame_generator=frame_generator
+                frame_generator=pull_frame
             )
         except Exception as e:
             logger.error(f"视频帧渲染过程中出错: {e}", exc_info=True)
             if error_callback:
                 error_callback(f"视频渲染失败: {e}")
             raise # 重新抛出异常
+        finally:
+            producer_stop.set()
 
         logger.info(f"滚动视频已成功创建: {output_path}")
         return output_path
 
+    def _render_text_image(self,
+                           text: str,
+                           font_path: str,
+                           width: int,
+                           min_height: int,
+                           font_size: int,
+                           font_color: Tuple[int, int, int],
+                           bg_color: Tuple[int, int, int, int],
+                           line_spacing: int,
+                           char_spacing: int,
+                           error_callback: Optional[Callable[[str], None]] = None
+    ) -> Tuple[Image.Image, int]:
+        """使用 TextRenderer 将文本渲染为图片，返回 (图片, 文本高度)"""
+        # 初始化 TextRenderer
+        try:
+            text_renderer = TextRenderer(
+                width=width,
+                font_path=font_path,  # 使用确认后的路径
+                font_size=font_size,
+                font_color=font_color,
+                bg_color=bg_color,
+                line_spacing=line_spacing,
+                char_spacing=char_spacing,
+            )
+        except Exception as e:
+            logger.error(f"初始化 TextRenderer 失败，字体: {font_path}, 错误: {e}", exc_info=True)
+            if error_callback:
+                error_callback(f"字体加载或渲染器初始化失败: {os.path.basename(font_path)} - {e}")
+            # 可以根据需要决定是抛出异常还是返回错误信息
+            raise  # 重新抛出异常，以便上层捕获
+
+        # 使用 TextRenderer 渲染文本为图片
+        try:
+            text_img, text_height = text_renderer.render_text_to_image(
+                text,
+                min_height=min_height # 传递缩放后的高度作为最小高度参考
+            )
+        except Exception as e:
+            logger.error(f"文本渲染为图片时出错: {e}", exc_info=True)
+            if error_callback:
+                error_callback(f"文本渲染失败: {e}")
+            raise # 重新抛出异常
+
+        return text_img, text_height
+
+    def _load_text_cache(self, cache_path: str) -> Optional[Tuple[Image.Image, int]]:
+        """从磁盘加载缓存的文本图片，不存在或损坏时返回None"""
+        if not os.path.exists(cache_path):
+            return None
+        try:
+            with np.load(cache_path) as data:
+                cached = Image.fromarray(data['img']), int(data['text_height'])
+            # 更新修改时间，淘汰时优先保留最近使用的缓存
+            os.utime(cache_path)
+            return cached
+        except Exception as e:
+            logger.warning(f"读取文本图片缓存失败: {cache_path}, 错误: {e}")
+            return None
+
+    def _save_text_cache(self, cache_path: str, img: Image.Image, text_height: int) -> None:
+        """将文本图片保存到磁盘缓存，失败时仅记录警告"""
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            # 先写临时文件再替换，避免并发读到不完整的文件
+            tmp_path = f"{cache_path[:-4]}.{os.getpid()}.tmp.npz"
+            np.savez_compressed(tmp_path, img=np.asarray(img.convert('RGBA'), dtype=np.uint8), text_height=text_height)
+            os.replace(tmp_path, cache_path)
+        except Exception as e:
+            logger.warning(f"保存文本图片缓存失败: {cache_path}, 错误: {e}")
+            return
+        self._prune_text_cache(os.path.dirname(cache_path))
+
+    def _prune_text_cache(self, cache_dir: str) -> None:
+        """缓存目录超过总大小或文件数上限时，按修改时间删除最旧的缓存文件"""
+        try:
+            entries = []
+            with os.scandir(cache_dir) as it:
+                for entry in it:
+                    if entry.name.endswith('.npz') and '.tmp.' not in entry.name and entry.is_file():
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError as e:
+            logger.warning(f"扫描文本图片缓存目录失败: {cache_dir}, 错误: {e}")
+            return
+
+        entries.sort()  # 最旧的在前
+        total_bytes = sum(size for _, size, _ in entries)
+        count = len(entries)
+        for _, size, path in entries:
+            if total_bytes <= TEXT_CACHE_MAX_BYTES and count <= TEXT_CACHE_MAX_FILES:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # 已被其他进程删除
+            except OSError as e:
+                logger.warning(f"删除文本图片缓存失败: {path}, 错误: {e}")
+                continue
+            total_bytes -= size
+            count -= 1
+
+    def _threaded_frame_producer(self,
+                                 frame_generator: Callable[[int], Optional[np.ndarray]],
+                                 total_frames: int,
+                                 maxsize: int = 8,
+                                 batch_size: int = 16
+    ) -> Tuple[Callable[[int], Optional[np.ndarray]], threading.Event]:
+        """
+        在独立线程中按顺序生成帧，通过有界队列供渲染器拉取
+        
+        Args:
+            frame_generator: 帧生成函数，若带有generate_batch属性则按批生成，
+                             若带有get_constant_tail属性则只生成尾帧之前的帧
+            total_frames: 总帧数
+            maxsize: 队列容量，限制预生成帧占用的内存
+            batch_size: 批量生成时每批的帧数
+            
+        Returns:
+            (拉取函数, 停止事件)，拉取函数须按帧索引顺序调用
+        """
+        frame_queue = queue.Queue(maxsize=maxsize)
+        stop_event = threading.Event()
+        producer_error = []
+        
+        batch_generator = getattr(frame_generator, 'generate_batch', None)
+        get_constant_tail = getattr(frame_generator, 'get_constant_tail', None)
+        produce_frames = total_frames
+        if get_constant_tail is not None:
+            produce_frames = max(0, min(total_frames, get_constant_tail()[0]))
+        
+        def put(item) -> bool:
+            # 带超时放入，便于消费端提前结束时退出
+            while not stop_event.is_set():
+                try:
+                    frame_queue.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        def produce():
+            # 批量合成内核在本线程中运行，线程数上限须在本线程设置
+            limit_numba_threads()
+            try:
+                for batch_start in range(0, produce_frames, batch_size):
+                    batch_end = min(batch_start + batch_size, produce_frames)
+                    if batch_generator is not None:
+                        frames = batch_generator(batch_start, batch_end)
+                    else:
+                        frames = [frame_generator(i) for i in range(batch_start, batch_end)]
+                    for offset, frame in enumerate(frames):
+                        if not put((batch_start + offset, frame)):
+                            return
+            except Exception as e:
+                logger.error(f"帧生产线程出错: {e}", exc_info=True)
+                producer_error.append(e)
+            # 结束标记
+            put(None)
+        
+        producer = threading.Thread(target=produce, name="FrameProducer", daemon=True)
+        producer.start()
+        
+        def pull_frame(frame_index: int) -> Optional[np.ndarray]:
+            """按顺序取出生产线程生成的帧"""
+            if stop_event.is_set():
+                return None
+            item = frame_queue.get()
+            if item is None:
+                stop_event.set()
+                if producer_error:
+                    raise producer_error[0]
+                return None
+            produced_index, frame = item
+            if produced_index != frame_index:
+                raise RuntimeError(f"帧顺序不一致: 期望 {frame_index}, 实际 {produced_index}")
+            return frame
+        
+        if get_constant_tail is not None:
+            pull_frame.get_constant_tail = get_constant_tail
+        return pull_frame, stop_event
+
     def _create_frame_generator(self,
                                  img: Image.Image,
                                  video_renderer: VideoRenderer,
                                  scroll_speed: int,
                                  scroll_frames_needed: int,
-                                 bg_color: Tuple[int, int, int, int]
+                                 bg_color: Tuple[int, int, int, int],
+                                 text_height: Optional[int] = None
     ) -> Callable[[int], Optional[np.ndarray]]:
         """
         创建用于生成视频帧的函数 (闭包)
@@ -379,9 +617,10 @@ class RollVideoService:
             scroll_speed: 每帧滚动的像素数 (在渲染分辨率下)
             scroll_frames_needed: 滚动结束帧数
             bg_color: 用户指定的背景色RGBA
+            text_height: 文本实际高度，文本完全滚出后的帧均为纯背景帧
             
         Returns:
-            一个函数，接收帧索引，返回该帧的Numpy数组 (H, W, C) 或 None
+            一个函数，接收帧索引，返回该帧的Numpy数组 (透明为 (H, W, 4)，不透明为平面GBR (3, H, W)) 或 None
         """
         img_width, img_height = img.size
         target_width = video_renderer.original_width # 目标视频宽度
@@ -389,135 +628,167 @@ class RollVideoService:
         scale_factor = video_renderer.scale_factor # 获取原始缩放因子
         transparent_bg = video_renderer.transparent # 是否需要透明背景
         
-        # 将Pillow图像转换为Numpy数组以便快速切片 (预转换为浮点数用于潜在的混合操作)
+        # 将Pillow图像转换为Numpy数组以便快速切片 (保持uint8，混合在合成内核中完成)
         # 确保图像是RGBA格式
         if img.mode != 'RGBA':
             logger.warning(f"文本图像模式为 {img.mode}, 正在转换为 RGBA")
             img = img.convert('RGBA')
-        img_np = np.array(img).astype(np.float32) / 255.0
-        
-        # 提取Alpha通道
-        alpha_channel = img_np[:, :, 3:4] # 保持维度 (H, W, 1)
-        # 提取RGB通道
-        rgb_channel = img_np[:, :, :3]
+        # 直接使用Pillow导出的C连续uint8 RGBA缓冲区，不再额外复制，也避免浮点副本占用4倍内存
+        # 注意：img_np 与图像共享/只读，帧生成过程中不得修改
+        img_np = np.asarray(img)
 
-        # 缓存帧数据，避免重复创建
-        frame_cache = {}
-
-        # 确认目标缓冲区的数据类型
-        # 如果背景不透明，可以直接使用uint8
-        # 如果背景透明，可能需要保持float32进行混合，或根据FFmpeg要求调整
-        target_dtype = np.uint8 if not transparent_bg else np.float32 
+        # 缓存最近的少量帧 (滚动帧按顺序访问，只需满足跳帧回看)
+        use_frame_cache = video_renderer.use_frame_cache
+        frame_cache = OrderedDict()
+        max_cached_frames = 4
 
         logger.info(f"帧生成器设置: img_size=({img_width},{img_height}), target_size=({target_width},{target_height}), scroll_speed={scroll_speed}, transparent={transparent_bg}, scroll_end_frame={scroll_frames_needed}")
-        # 使用用户指定的背景色创建背景帧模板
-        bg_color_arr = np.array(bg_color, dtype=np.uint8)
-        if transparent_bg:
-            # RGBA背景模板
-            background_frame = np.ones((target_height, target_width, 4), dtype=np.uint8) * bg_color_arr
-            # 预转换为浮点用于混合，仅RGB通道
-            background_float = background_frame[..., :3].astype(np.float32) / 255.0
-        else:
-            # RGB背景模板
-            background_frame = np.ones((target_height, target_width, 3), dtype=np.uint8) * bg_color_arr[:3]
-            background_float = background_frame.astype(np.float32) / 255.0
 
         # 明确划分两个帧索引区间：滚动区间和结束区间
         # 滚动区间: [0, scroll_frames_needed - 1]
         # 结束区间: [scroll_frames_needed, infinity)
         logger.info(f"关键帧范围划分: 滚动区间[0-{scroll_frames_needed-1}], 结束区间[{scroll_frames_needed}+]")
         
+        # 滚动速度统一为浮点数，位置由帧索引直接计算 (无状态，可乱序/并发调用)
+        scroll_speed = float(scroll_speed)
+        
+        # 滚动进度完全确定，预先计算每一帧的切片起始行，供批量合成使用
+        positions = np.floor(np.arange(scroll_frames_needed) * scroll_speed).astype(np.int64)
+        # 切片起始行仍在图像内的帧数，之后的帧均为纯背景帧
+        visible_end = int(np.searchsorted(positions, img_height))
+        
+        # 按背景模式生成专用的渲染函数，尺寸和模式在此固定
+        if transparent_bg:
+            background_frame, render_frame, render_batch = self._make_transparent_generator(
+                img_np, bg_color, target_width, target_height, positions
+            )
+        else:
+            background_frame, render_frame, render_batch = self._make_opaque_generator(
+                img_np, bg_color, target_width, target_height, positions
+            )
+        
         # 创建一个纯背景帧的缓存，避免重复创建
         end_frame = background_frame.copy()
         
-        # 创建浮点数位置累加器，精确计算滚动位置
-        position_accumulator = 0.0
+        # 文本完全滚出画面后(图像底部为背景色空白)，之后的帧都与纯背景帧相同
+        if text_height is not None:
+            constant_tail_start = min(scroll_frames_needed, int(np.ceil(text_height / scroll_speed)))
+        else:
+            constant_tail_start = scroll_frames_needed
         
         def frame_generator(frame_index: int) -> Optional[np.ndarray]:
             """生成指定索引的视频帧，严格区分滚动阶段和结束阶段"""
-            nonlocal frame_cache, position_accumulator
-            
             # 如果启用了帧缓存且已缓存，直接返回
-            if video_renderer.use_frame_cache and frame_index in frame_cache:
+            if use_frame_cache and frame_index in frame_cache:
                 return frame_cache[frame_index]
             
-            # === 关键分支点：根据帧索引确定阶段 ===
-            
-            # 结束阶段：如果帧索引超过或等于滚动所需帧数，直接返回背景帧
-            if frame_index >= scroll_frames_needed:
-                logger.debug(f"帧索引 {frame_index} 已进入结束阶段 (滚动结束帧={scroll_frames_needed})，返回背景帧")
-                if video_renderer.use_frame_cache and frame_index not in frame_cache:
-                    frame_cache[frame_index] = end_frame
-                return end_frame
-                
-            # === 滚动阶段 ===
-            
-            # 精确计算滚动位置 - 使用浮点数位置累加器而不是简单乘法，提高精度
-            # 尤其适用于滚动速度为小数的情况(如：0.5像素/帧)
-            if frame_index == 0:
-                # 第一帧重置累加器
-                position_accumulator = 0.0
-            else:
-                # 非第一帧，累加滚动位置
-                position_accumulator += scroll_speed
-                
-            # 这里保留浮点数精度，只在实际切片时再取整
-            current_position = position_accumulator
-            
-            # 如果需要调试浮点精度，取消下面的注释
-            # if frame_index % 30 == 0:  # 每30帧记录一次
-            #     logger.debug(f"帧 {frame_index}: 精确位置={current_position:.2f}px, 累加器={position_accumulator:.2f}")
-            
-            # 边界检查：如果已超出图像高度，返回背景帧（内部安全检查）
-            if current_position >= img_height:
-                logger.debug(f"帧 {frame_index}: 位置 {current_position:.2f}px 超出图像高度 {img_height}px")
-                if video_renderer.use_frame_cache and frame_index not in frame_cache:
-                    frame_cache[frame_index] = end_frame
+            # 结束阶段，或切片起始位置已超出图像高度，直接返回背景帧
+            if frame_index >= visible_end:
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("帧索引 %s 已进入结束阶段 (滚动结束帧=%s)，返回背景帧", frame_index, scroll_frames_needed)
                 return end_frame
-                
-            # 计算切片区域 - 此处转为整数用于切片
-            slice_start = int(current_position)  
-            slice_end = slice_start + target_height
-            
-            # 边界检查
-            if slice_start >= img_height or slice_start >= slice_end:
-                logger.debug(f"帧 {frame_index}: 切片范围无效 ({slice_start}:{slice_end})")
-                if video_renderer.use_frame_cache and frame_index not in frame_cache:
-                    frame_cache[frame_index] = end_frame
-                return end_frame
-                
-            # 限制切片范围
-            slice_end = min(slice_end, img_height)
-            slice_height = slice_end - slice_start
             
-            # 获取源数据
-            source_rgb = rgb_channel[slice_start:slice_end, :, :]
-            source_alpha = alpha_channel[slice_start:slice_end, :, :]
-            
-            # 创建输出帧
-            if transparent_bg:
-                # 透明背景
-                frame_canvas = background_frame.copy()
-                frame_canvas[0:slice_height, :, :3] = (source_rgb * 255).astype(np.uint8)
-                frame_canvas[0:slice_height, :, 3:4] = (source_alpha * 255).astype(np.uint8)
-            else:
-                # 不透明背景
-                frame_canvas = background_float.copy()
-                # Alpha混合
-                target_section = frame_canvas[0:slice_height, :, :]
-                blended_section = blend_alpha_fast(source_rgb, target_section, source_alpha)
-                frame_canvas[0:slice_height, :, :] = blended_section
-                # 转换回uint8
-                frame_canvas = (frame_canvas * 255).astype(np.uint8)
+            # === 滚动阶段 ===
+            frame_canvas = render_frame(frame_index)
                 
             # 缓存帧
-            if video_renderer.use_frame_cache:
+            if use_frame_cache:
                 frame_cache[frame_index] = frame_canvas
+                if len(frame_cache) > max_cached_frames:
+                    frame_cache.popitem(last=False)
                 
             # 每500帧记录一次进度
-            if frame_index % 500 == 0:
-                logger.debug(f"生成滚动帧: {frame_index}/{scroll_frames_needed}, 位置={current_position:.2f}px")
+            if frame_index % 500 == 0 and logger.isEnabledFor(logging.DEBUG):
+                logger.debug("生成滚动帧: %s/%s, 位置=%spx", frame_index, scroll_frames_needed, positions[frame_index])
                 
             return frame_canvas
-            
-        return frame_generator
\ No newline at end of file
+        
+        def generate_batch(start_index: int, end_index: int) -> List[np.ndarray]:
+            """批量生成 [start_index, end_index) 区间的帧"""
+            scroll_end = max(start_index, min(end_index, visible_end))
+            frames = []
+            if start_index < scroll_end:
+                frames.extend(render_batch(start_index, scroll_end))
+            # 结束阶段直接复用背景帧
+            frames.extend(end_frame for _ in range(scroll_end, end_index))
+            return frames
+        
+        def get_constant_tail() -> Tuple[int, np.ndarray]:
+            """返回恒定尾帧的起始索引和帧数据"""
+            return constant_tail_start, end_frame
+        
+        frame_generator.generate_batch = generate_batch
+        frame_generator.get_constant_tail = get_constant_tail
+        return frame_generator
+
+    def _make_opaque_generator(self,
+                               img_np: np.ndarray,
+                               bg_color: Tuple[int, int, int, int],
+                               target_width: int,
+                               target_height: int,
+                               positions: np.ndarray
+    ) -> Tuple[np.ndarray, Callable[[int], np.ndarray], Callable[[int, int], List[np.ndarray]]]:
+        """
+        创建不透明背景的专用渲染函数，输出平面GBR帧 (3, H, W)
+        
+        Returns:
+            (背景帧, 单帧渲染函数, 批量渲染函数)
+        """
+        # 拆分为R/G/B/A平面，混合时按行连续读取
+        src_planes = np.ascontiguousarray(img_np.transpose(2, 0, 1))
+        
+        # 平面GBR背景模板，与FFmpeg gbrp输入格式一致
+        frame_shape = (3, target_height, target_width)
+        background_frame = np.empty(frame_shape, dtype=np.uint8)
+        background_frame[:] = np.array(bg_color, dtype=np.uint8)[[1, 2, 0], np.newaxis, np.newaxis]
+        
+        # 预热合成内核，避免首帧触发JIT编译
+        composite_scroll_frames_batch(src_planes, background_frame, np.empty((1,) + frame_shape, dtype=np.uint8), np.zeros(1, dtype=np.int64))
+        
+        def render_frame(frame_index: int) -> np.ndarray:
+            # 帧以引用方式进入写入队列，每帧使用新的缓冲区；超出源图像的行由内核填充背景
+            frame_canvas = np.empty(frame_shape, dtype=np.uint8)
+            composite_scroll_frames_batch(src_planes, background_frame, frame_canvas[np.newaxis], positions[frame_index:frame_index + 1])
+            return frame_canvas
+        
+        def render_batch(start_index: int, end_index: int) -> List[np.ndarray]:
+            # 一次内核调用完成整批帧的合成
+            batch = np.empty((end_index - start_index,) + frame_shape, dtype=np.uint8)
+            composite_scroll_frames_batch(src_planes, background_frame, batch, positions[start_index:end_index])
+            return list(batch)
+        
+        return background_frame, render_frame, render_batch
+
+    def _make_transparent_generator(self,
+                                    img_np: np.ndarray,
+                                    bg_color: Tuple[int, int, int, int],
+                                    target_width: int,
+                                    target_height: int,
+                                    positions: np.ndarray
+    ) -> Tuple[np.ndarray, Callable[[int], np.ndarray], Callable[[int, int], List[np.ndarray]]]:
+        """
+        创建透明背景的专用渲染函数，输出RGBA帧 (H, W, 4)
+        
+        Returns:
+            (背景帧, 单帧渲染函数, 批量渲染函数)
+        """
+        img_height = img_np.shape[0]
+        
+        # RGBA背景模板
+        background_frame = np.empty((target_height, target_width, 4), dtype=np.uint8)
+        background_frame[:] = np.array(bg_color, dtype=np.uint8)
+        
+        def render_frame(frame_index: int) -> np.ndarray:
+            # 只分配未初始化内存，每一行只写一次
+            slice_start = int(positions[frame_index])
+            slice_height = min(target_height, img_height - slice_start)
+            frame_canvas = np.empty_like(background_frame)
+            if slice_height < target_height:
+                np.copyto(frame_canvas[slice_height:], background_frame[slice_height:])
+            np.copyto(frame_canvas[:slice_height], img_np[slice_start:slice_start + slice_height])
+            return frame_canvas
+        
+        def render_batch(start_index: int, end_index: int) -> List[np.ndarray]:
+            return [render_frame(i) for i in range(start_index, end_index)]
+        
+        return background_frame, render_frame, render_batch
@@ -373,7 +373,7 @@ class VideoRenderer:
                             target_area = frame_rgba[frame_h_slice, frame_w_slice]
                             if target_area.shape[:2] == source_section.shape[:2]: np.copyto(target_area, source_section)
                             else: copy_width = min(target_area.shape[1], source_section.shape[1]); target_area[:target_area.shape[0], :copy_width] = source_section[:target_area.shape[0], :copy_width]
-                            output_frame_data = frame_rgba.tobytes()
+                            output_frame_data = memoryview(frame_rgba).cast('B')
                         else:
                             frame_rgb = background_frame_rgb.copy()
                             target_area = frame_rgb[frame_h_slice, frame_w_slice]
@@ -388,10 +388,10 @@ class VideoRenderer:
                                 alpha = source_section_crop[:, :, 3:4].astype(np.float32) / 255.0
                                 blended = (source_section_crop[:, :, :3].astype(np.float32) * alpha + target_area_crop.astype(np.float32) * (1.0 - alpha))
                                 target_area[:target_area.shape[0], :copy_width] = blended.astype(np.uint8)
-                            output_frame_data = frame_rgb.tobytes()
+                            output_frame_data = memoryview(frame_rgb).cast('B')
                     else:
-                        if transparency_required: output_frame_data = np.zeros((self.height, self.width, 4), dtype=np.uint8).tobytes()
-                        else: output_frame_data = background_frame_rgb.tobytes()
+                        if transparency_required: output_frame_data = memoryview(np.zeros((self.height, self.width, 4), dtype=np.uint8)).cast('B')
+                        else: output_frame_data = memoryview(background_frame_rgb).cast('B')
                     if output_frame_data:
                         try: process.stdin.write(output_frame_data)
                         except (IOError, BrokenPipeError) as e:
@@ -24,6 +24,7 @@ from .renderer import (
     init_shared_memory,
     cleanup_shared_memory,
     init_worker,
+    init_worker_runtime,
     test_worker_shared_memory,
     limit_resources,
     log_system_info,
@@ -48,6 +49,7 @@ __all__ = [
     "init_shared_memory",
     "cleanup_shared_memory",
     "init_worker",
+    "init_worker_runtime",
     "test_worker_shared_memory",
     "limit_resources",
     "log_system_info",
@@ -11,11 +11,25 @@ import traceback
 import time
 import random
 
+from .scroll_kernel import scroll_into
+
 logger = logging.getLogger(__name__)
 
+# 旧版渲染路径使用的全局图像数组和输出帧环（主进程中直接设置，工作进程中由共享内存绑定）
+_g_img_array = None
+_g_frame_ring = None
+# 工作进程中已连接的输出帧环共享内存
+_FRAME_RING_SHM = None
+
 # 全局共享内存字典（进程内共享）
 _SHARED_MEMORY_DICT = {}
 _LOCAL_PROCESS_ID = None
+# 已连接的输出帧共享内存槽位缓存 {槽位名: SharedMemory}
+_OUTPUT_SLOTS = {}
+# 已连接的源图像共享内存
+_SOURCE_SHM = None
+# 进程池复用时用于确保每个工作进程都收到新渲染参数的屏障
+_RUNTIME_BARRIER = None
 
 def init_shared_memory(shared_dict):
     """
@@ -71,14 +85,16 @@ def cleanup_shared_memory(shm_name=None):
         logger.error(f"清理共享内存过程出错: {str(e)}\n{traceback.format_exc()}")
         return False
 
-def init_worker(shared_dict):
+def init_worker(shared_dict, barrier=None):
     """
     初始化工作进程
     
     Args:
         shared_dict: 共享内存信息字典
+        barrier: 进程池复用时供init_worker_runtime使用的屏障
     """
-    global _SHARED_MEMORY_DICT, _LOCAL_PROCESS_ID
+    global _SHARED_MEMORY_DICT, _LOCAL_PROCESS_ID, _RUNTIME_BARRIER
+    _RUNTIME_BARRIER = barrier
     
     # 设置进程名，便于调试
     _LOCAL_PROCESS_ID = os.getpid()
@@ -90,6 +106,7 @@ def init_worker(shared_dict):
     try:
         # 存储共享内存信息
         _SHARED_MEMORY_DICT = shared_dict
+        _bind_frame_ring(shared_dict)
         
         # 在工作进程中记录初始化
         logger.info(f"工作进程 {_LOCAL_PROCESS_ID} 初始化，连接到共享内存 {shared_dict.get('shm_name', 'unknown')}")
@@ -105,6 +122,58 @@ def init_worker(shared_dict):
         logger.error(f"工作进程 {_LOCAL_PROCESS_ID} 初始化失败: {str(e)}\n{traceback.format_exc()}")
         return False
 
+def init_worker_runtime(shared_dict):
+    """
+    进程池跨渲染复用时，为工作进程重新绑定本次渲染的共享内存信息
+
+    主进程按工作进程数提交本任务（chunksize=1），每个任务在屏障处等待，
+    所有工作进程都取到任务后才一起返回，从而保证每个进程恰好执行一次。
+
+    Args:
+        shared_dict: 本次渲染的共享内存信息字典
+
+    Returns:
+        是否重新绑定成功
+    """
+    global _SHARED_MEMORY_DICT, _SOURCE_SHM, _g_img_array, _g_frame_ring
+    try:
+        # 断开上一次渲染的槽位和源图像映射，它们已被主进程删除
+        _g_img_array = _g_frame_ring = None
+        for slot_name in list(_OUTPUT_SLOTS):
+            if slot_name not in shared_dict.get('frame_slots', ()):
+                _OUTPUT_SLOTS.pop(slot_name).close()
+        if _SOURCE_SHM is not None and _SOURCE_SHM.name.lstrip('/') != shared_dict.get('shm_name', '').lstrip('/'):
+            _SOURCE_SHM.close()
+            _SOURCE_SHM = None
+        _SHARED_MEMORY_DICT = shared_dict
+        _bind_frame_ring(shared_dict)
+        if _RUNTIME_BARRIER is not None:
+            _RUNTIME_BARRIER.wait(timeout=30)
+        return True
+    except Exception as e:
+        logger.error(f"工作进程 {_LOCAL_PROCESS_ID} 重新绑定共享内存失败: {str(e)}")
+        return False
+
+def _bind_frame_ring(shared_dict):
+    """
+    旧版渲染路径：在工作进程中把源图像和输出帧环共享内存绑定为全局数组，
+    供_process_frame_into_slot使用；共享内存信息中没有帧环时只断开旧的帧环
+    """
+    global _g_img_array, _g_frame_ring, _FRAME_RING_SHM
+    _g_img_array = _g_frame_ring = None
+    ring_name = shared_dict.get('ring_name')
+    if _FRAME_RING_SHM is not None and (
+        ring_name is None or _FRAME_RING_SHM.name.lstrip('/') != ring_name.lstrip('/')
+    ):
+        _FRAME_RING_SHM.close()
+        _FRAME_RING_SHM = None
+    if ring_name is None:
+        return
+    if _FRAME_RING_SHM is None:
+        _FRAME_RING_SHM = shared_memory.SharedMemory(name=ring_name)
+    _g_frame_ring = np.ndarray(shared_dict['ring_shape'], dtype=np.uint8, buffer=_FRAME_RING_SHM.buf)
+    _g_img_array = _get_source_image(shared_dict)
+
 def test_worker_shared_memory(shared_dict):
     """
     测试工作进程共享内存访问
@@ -162,90 +231,65 @@ def test_worker_shared_memory(shared_dict):
         logger.error(f"进程 {pid}: 共享内存测试出错: {str(e)}\n{traceback.format_exc()}")
         return False
 
-def _process_frame_optimized_shm(args):
+def _get_output_slot(slot_name, shape):
+    """连接输出帧共享内存槽位（每个进程只连接一次），返回其上的帧视图"""
+    shm = _OUTPUT_SLOTS.get(slot_name)
+    if shm is None:
+        shm = shared_memory.SharedMemory(name=slot_name)
+        _OUTPUT_SLOTS[slot_name] = shm
+    return np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+
+def _get_source_image(shared_dict):
+    """连接源图像共享内存（每个进程只连接一次），返回其上的图像视图"""
+    global _SOURCE_SHM
+    shm_name = shared_dict['shm_name']
+    if _SOURCE_SHM is None or _SOURCE_SHM.name.lstrip('/') != shm_name.lstrip('/'):
+        _SOURCE_SHM = shared_memory.SharedMemory(name=shm_name)
+    return np.ndarray(shared_dict['img_shape'], dtype=np.uint8, buffer=_SOURCE_SHM.buf)
+
+def _process_frame_optimized_shm(task):
     """
     使用共享内存优化的帧处理函数
     
+    渲染参数在init_worker时随共享内存信息字典一次性传入，任务只携带帧索引，
+    滚动偏移量由帧索引推导：开头静止帧停在顶部，滚动帧按速度递增，结尾静止帧停在最终位置
+    
     Args:
-        args: 包含帧索引和帧元数据的元组
+        task: 帧索引，或 (帧索引, 输出槽位序号)，
+              指定槽位时帧直接渲染到该共享内存中，不经进程池管道回传
     
     Returns:
-        元组 (帧索引, 帧数据) 或 None (如果处理失败)
+        元组 (帧索引, 帧数据) 或 (帧索引, 槽位序号)，
+        处理失败时第二项为None（保留帧索引以便主进程按序重排）
     """
-    global _SHARED_MEMORY_DICT, _LOCAL_PROCESS_ID
-    
-    frame_idx, frame_meta = args
+    if isinstance(task, tuple):
+        frame_idx, slot_idx = task
+    else:
+        frame_idx, slot_idx = task, None
     
     try:
-        # 获取共享内存信息
-        shm_name = _SHARED_MEMORY_DICT.get('shm_name')
-        img_shape = _SHARED_MEMORY_DICT.get('img_shape')
+        info = _SHARED_MEMORY_DICT
+        source_img = _get_source_image(info)
+        frame_shape = info['frame_shape']
+        if slot_idx is not None:
+            frame = _get_output_slot(info['frame_slots'][slot_idx], frame_shape)
+        else:
+            frame = np.empty(frame_shape, dtype=np.uint8)
         
-        if not shm_name or not img_shape:
-            logger.error(f"进程 {_LOCAL_PROCESS_ID}: 帧 {frame_idx} 缺少共享内存信息")
-            return None
+        # 由帧索引计算滚动偏移量
+        step = min(max(frame_idx - info['padding_frames_start'], 0), info['scroll_frames'])
+        offset = min(int(step * info['scroll_speed']), info['max_offset'])
         
-        # 尝试访问共享内存
-        try:
-            shm = shared_memory.SharedMemory(name=shm_name)
-        except Exception as e:
-            logger.error(f"进程 {_LOCAL_PROCESS_ID}: 帧 {frame_idx} 无法访问共享内存: {str(e)}")
-            return None
+        # 复制图像窗口，超出源图像的部分填充背景
+        scroll_into(source_img, frame, offset, info['fill'])
+        
+        if slot_idx is not None:
+            return (frame_idx, slot_idx)
+        return (frame_idx, frame)
         
-        try:
-            # 创建对共享内存的视图
-            source_img = np.ndarray(img_shape, dtype=np.uint8, buffer=shm.buf)
-            
-            # 从元数据获取参数
-            width = frame_meta['width']
-            height = frame_meta['height']
-            img_height = frame_meta['img_height']
-            scroll_speed = frame_meta['scroll_speed']
-            fps = frame_meta['fps']
-            
-            # 创建输出帧
-            frame = np.ones((height, width, 3), dtype=np.uint8) * 255
-            
-            # 计算当前帧的垂直位置
-            if scroll_speed > 0:
-                # 计算滚动偏移量
-                total_scroll_distance = img_height - height
-                current_position = min(
-                    total_scroll_distance,
-                    max(0, int(frame_idx * scroll_speed / fps))
-                )
-                
-                # 计算源图像和目标帧的重叠区域
-                src_start_y = current_position
-                src_end_y = min(img_height, src_start_y + height)
-                dst_start_y = 0
-                dst_end_y = src_end_y - src_start_y
-                
-                # 复制图像数据
-                frame[dst_start_y:dst_end_y, :, :] = source_img[src_start_y:src_end_y, :, :]
-            else:
-                # 如果不需要滚动，则居中放置图像
-                if img_height < height:
-                    start_y = (height - img_height) // 2
-                    frame[start_y:start_y+img_height, :, :] = source_img
-                else:
-                    # 如果图像高度超过视频高度，仅显示顶部
-                    frame[:, :, :] = source_img[:height, :, :]
-            
-            # 关闭共享内存（不销毁）
-            shm.close()
-            
-            return (frame_idx, frame)
-            
-        except Exception as e:
-            logger.error(f"进程 {_LOCAL_PROCESS_ID}: 处理帧 {frame_idx} 时出错: {str(e)}\n{traceback.format_exc()}")
-            shm.close()
-            # 返回黑色帧而不是None，以避免视频中断
-            return (frame_idx, np.zeros((frame_meta['height'], frame_meta['width'], 3), dtype=np.uint8))
-            
     except Exception as e:
-        logger.error(f"进程 {_LOCAL_PROCESS_ID}: 处理帧 {frame_idx} 时发生致命错误: {str(e)}\n{traceback.format_exc()}")
-        return None
+        logger.error(f"进程 {_LOCAL_PROCESS_ID}: 处理帧 {frame_idx} 时出错: {str(e)}\n{traceback.format_exc()}")
+        return (frame_idx, None)
 
 def _process_frame(args):
     """多进程帧处理函数，高性能优化版本"""
@@ -356,7 +400,8 @@ def _process_frame_optimized(args):
             frame = np.zeros((self_height, self_width, 4), dtype=np.uint8, order='C')
         else:
             # 使用背景色
-            frame = np.ones((self_height, self_width, 3), dtype=np.uint8, order='C') * np.array(bg_color, dtype=np.uint8)
+            frame = np.empty((self_height, self_width, 3), dtype=np.uint8, order='C')
+            frame[:] = bg_color
         return frame_idx, frame
     
     # 预分配帧缓冲区 - 提高效率，确保内存连续
@@ -365,7 +410,8 @@ def _process_frame_optimized(args):
         frame = np.zeros((self_height, self_width, 4), dtype=np.uint8, order='C')
     else:
         # 用背景色填充帧
-        frame = np.ones((self_height, self_width, 3), dtype=np.uint8, order='C') * np.array(bg_color, dtype=np.uint8)
+        frame = np.empty((self_height, self_width, 3), dtype=np.uint8, order='C')
+        frame[:] = bg_color
     
     # 计算切片 - 超高效版
     source_height = min(visible_height, self_height)
@@ -380,63 +426,25 @@ def _process_frame_optimized(args):
     # 由于我们已经在创建时指定order='C'，这里可以省略额外的检查
     return frame_idx, frame
 
-def fast_frame_processor(batch_frames, memory_pool, ffmpeg_process):
+def _process_frame_into_slot(task):
     """
-    高性能帧处理器，直接将帧写入FFmpeg进程
-    
+    旧版渲染路径的帧处理函数：帧直接渲染到共享内存帧环的槽位中，只回传槽位序号
+
     Args:
-        batch_frames: 批处理帧参数列表
-        memory_pool: 内存池
-        ffmpeg_process: FFmpeg进程
-        
+        task: (帧参数, 槽位序号)，帧参数与_process_frame_optimized相同
+
     Returns:
-        处理的帧数
+        元组 (帧索引, 槽位序号)
     """
-    global _g_img_array
-    
-    if _g_img_array is None:
-        return 0
-        
-    frames_processed = 0
-    
-    for args in batch_frames:
-        frame_idx, img_start_y, img_height, img_width, self_height, self_width, is_transparent, bg_color = args
-        
-        # 快速路径计算
-        img_end_y = min(img_height, img_start_y + self_height)
-        visible_height = img_end_y - img_start_y
-        
-        # 从内存池获取帧缓冲区
-        if memory_pool is not None and len(memory_pool) > 0:
-            frame = memory_pool.pop()
-            if is_transparent:
-                frame.fill(0)  # 透明帧填充0
-            else:
-                # RGB帧填充背景色
-                frame[:, :, 0].fill(bg_color[0])
-                frame[:, :, 1].fill(bg_color[1])
-                frame[:, :, 2].fill(bg_color[2])
-        else:
-            # 内存池为空，创建新帧
-            if is_transparent:
-                frame = np.zeros((self_height, self_width, 4), dtype=np.uint8)
-            else:
-                frame = np.ones((self_height, self_width, 3), dtype=np.uint8) * np.array(bg_color, dtype=np.uint8)
-        
-        # 计算切片并复制数据
-        source_height = min(visible_height, self_height)
-        source_width = min(img_width, self_width)
-        
-        if source_height > 0 and source_width > 0:
-            frame[:source_height, :source_width] = _g_img_array[img_start_y:img_start_y+source_height, :source_width]
-        
-        # 直接写入FFmpeg进程
-        ffmpeg_process.stdin.write(frame.tobytes())
-        
-        # 将帧缓冲区放回内存池
-        if memory_pool is not None:
-            memory_pool.append(frame)
-            
-        frames_processed += 1
-        
-    return frames_processed
\ No newline at end of file
+    params, slot = task
+    frame_idx, img_start_y, img_height, img_width, self_height, self_width, is_transparent, bg_color = params
+    frame = _g_frame_ring[slot]
+    fill = 0 if is_transparent else bg_color
+
+    # 复制可见部分，其余区域填充背景
+    source_height = max(0, min(img_height - img_start_y, self_height))
+    source_width = min(img_width, self_width)
+    frame[:source_height, :source_width] = _g_img_array[img_start_y:img_start_y + source_height, :source_width]
+    frame[:source_height, source_width:] = fill
+    frame[source_height:] = fill
+    return frame_idx, slot
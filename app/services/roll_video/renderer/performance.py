@@ -7,7 +7,6 @@ import logging
 import numpy as np
 from collections import deque
 import os
-import re
 import sys
 from tqdm import tqdm
 
@@ -45,6 +44,7 @@ class PerformanceMonitor:
         
         # 标志
         self.running = False
+        self._stop_event = threading.Event()
         self.monitor_thread = None
         
         # 状态变量
@@ -132,10 +132,12 @@ class PerformanceMonitor:
     def start(self, interval=1.0):
         """启动后台监控线程"""
         self.running = True
+        self._stop_event.clear()
         self.start_time = time.time()
         
         def _monitor_loop():
-            while self.running:
+            # 按间隔等待停止事件，stop()设置事件后立即退出
+            while not self._stop_event.wait(interval):
                 try:
                     # 收集CPU使用率
                     self.cpu_percent_history.append(self.process.cpu_percent(interval=0.1))
@@ -150,12 +152,8 @@ class PerformanceMonitor:
                     # 计算平均值
                     avg_cpu = sum(self.cpu_percent_history) / len(self.cpu_percent_history) if self.cpu_percent_history else 0
                     avg_memory = sum(self.memory_usage_history) / len(self.memory_usage_history) if self.memory_usage_history else 0
-                    
-                    # 休眠
-                    time.sleep(interval)
                 except Exception as e:
                     logger.error(f"性能监控异常: {e}")
-                    time.sleep(interval)
         
         self.monitor_thread = threading.Thread(target=_monitor_loop)
         self.monitor_thread.daemon = True
@@ -165,8 +163,9 @@ class PerformanceMonitor:
     def stop(self):
         """停止监控线程"""
         self.running = False
+        self._stop_event.set()
         if self.monitor_thread:
-            self.monitor_thread.join(timeout=1.0)
+            self.monitor_thread.join()
         
         # 计算总体性能
         end_time = time.time()
@@ -267,30 +266,33 @@ class PerformanceMonitor:
         }
 
     @staticmethod
-    def monitor_ffmpeg_progress(process, total_duration, total_frames, encoding_start_time=None):
+    def monitor_ffmpeg_progress(process, total_duration, total_frames, encoding_start_time=None,
+                                progress_pipe=None, stderr_tail=None):
         """
         监控FFmpeg进度并显示进度条
+
+        FFmpeg以-progress输出key=value形式的进度块，每块以progress=continue/end结尾；
+        监控线程按块用partition拆分键值，不做正则匹配。监控线程是进度管道的唯一读取者，
+        逐行读取直到FFmpeg关闭管道，管道不会因无人读取而写满导致FFmpeg阻塞
         
         参数:
             process: FFmpeg进程对象
             total_duration: 视频总时长（秒）
             total_frames: 视频总帧数
-            encoding_start_time: 编码开始时间（如果为None则使用当前时间）
+            encoding_start_time: 编码开始时间，time.monotonic()的取值（如果为None则使用当前时间）
+            progress_pipe: 二进制模式的进度管道，为None时读取process.stderr
+            stderr_tail: 可选的deque，保存最后几行非进度输出供失败时输出
         
         返回:
             监控线程对象
         """
         if encoding_start_time is None:
-            encoding_start_time = time.time()
+            encoding_start_time = time.monotonic()
+        if progress_pipe is None:
+            progress_pipe = process.stderr
             
         # 创建进度监控线程
         def progress_monitor_thread():
-            # 保存进度正则表达式模式
-            frame_pattern = re.compile(r"frame=\s*(\d+)")
-            time_pattern = re.compile(r"time=\s*(\d+:\d+:\d+\.\d+)")
-            fps_pattern = re.compile(r"fps=\s*(\d+\.?\d*)")
-            speed_pattern = re.compile(r"speed=\s*([\d.]+)x")
-            
             # 创建TQDM进度条（精简格式，自动适应屏幕宽度）
             pbar = tqdm(
                 total=100, 
@@ -303,73 +305,74 @@ class PerformanceMonitor:
             
             last_progress = 0
             last_frame = 0
+            block = {}  # 当前进度块的键值
             
             try:
-                while process.poll() is None:
-                    # 非阻塞方式读取stderr
-                    stderr_line = process.stderr.readline()
-                    if not stderr_line:
-                        time.sleep(0.1)  # 减少CPU使用
+                # 阻塞读取进度管道，FFmpeg退出后读到EOF即结束
+                for line in iter(progress_pipe.readline, b""):
+                    key, sep, value = line.strip().partition(b"=")
+                    if not sep:
+                        # 不是进度键值（进度与日志共用stderr时），保留用于失败时输出
+                        if stderr_tail is not None and key:
+                            stderr_tail.append(key)
+                        continue
+                    if key != b"progress":
+                        block[key] = value
                         continue
-                        
-                    stderr_line = stderr_line.strip()
-                    
-                    # 解析进度信息
-                    frame_match = frame_pattern.search(stderr_line)
-                    time_match = time_pattern.search(stderr_line)
-                    fps_match = fps_pattern.search(stderr_line)
-                    speed_match = speed_pattern.search(stderr_line)
                     
-                    # 更新进度信息
-                    if time_match:
-                        # 从时间字符串(HH:MM:SS.MS)解析时间
-                        time_str = time_match.group(1)
-                        time_parts = time_str.split(':')
-                        if len(time_parts) == 3:
-                            hours = int(time_parts[0])
-                            minutes = int(time_parts[1])
-                            seconds = float(time_parts[2])
-                            current_time_sec = hours * 3600 + minutes * 60 + seconds
-                            
-                            # 计算实际进度百分比
-                            progress = min(1.0, current_time_sec / total_duration) * 100
-                            
-                            # 更新进度条
-                            if progress > last_progress:
-                                pbar.update(progress - last_progress)
-                                last_progress = progress
-                            
-                            # 获取当前帧数和速度
-                            current_frame = int(frame_match.group(1)) if frame_match else 0
-                            fps = float(fps_match.group(1)) if fps_match else 0
-                            speed = float(speed_match.group(1)) if speed_match else 0
-                            
-                            # 计算已用时间和预计剩余时间
-                            elapsed = time.time() - encoding_start_time
-                            
-                            if progress > 0:
-                                eta = elapsed / (progress/100) - elapsed
-                                eta_str = f"{eta:.1f}秒"
-                            else:
-                                eta_str = "未知"
-                            
-                            # 更新进度条后缀信息（精简格式）
-                            pbar.set_postfix(
-                                帧=f"{current_frame}/{total_frames}", 
-                                剩余=eta_str
+                    # 一个进度块结束，解析本块信息
+                    # out_time_us为微秒（旧版FFmpeg只输出同样以微秒为单位的out_time_ms）
+                    out_time = block.get(b"out_time_us") or block.get(b"out_time_ms") or b""
+                    if out_time.isdigit():
+                        current_time_sec = int(out_time) / 1_000_000
+                        
+                        # 计算实际进度百分比
+                        progress = min(1.0, current_time_sec / total_duration) * 100
+                        
+                        # 更新进度条
+                        if progress > last_progress:
+                            pbar.update(progress - last_progress)
+                            last_progress = progress
+                        
+                        # 获取当前帧数和速度（未知时FFmpeg输出N/A）
+                        frame_value = block.get(b"frame", b"")
+                        current_frame = int(frame_value) if frame_value.isdigit() else 0
+                        try:
+                            fps = float(block.get(b"fps", b"0"))
+                        except ValueError:
+                            fps = 0
+                        try:
+                            speed = float(block.get(b"speed", b"0x").rstrip(b"x"))
+                        except ValueError:
+                            speed = 0
+                        
+                        # 计算已用时间和预计剩余时间
+                        elapsed = time.monotonic() - encoding_start_time
+                        
+                        if progress > 0:
+                            eta = elapsed / (progress/100) - elapsed
+                            eta_str = f"{eta:.1f}秒"
+                        else:
+                            eta_str = "未知"
+                        
+                        # 更新进度条后缀信息（精简格式）
+                        pbar.set_postfix(
+                            帧=f"{current_frame}/{total_frames}", 
+                            剩余=eta_str
+                        )
+                        
+                        # 记录日志（不那么频繁）
+                        if current_frame - last_frame >= total_frames / 20:  # 每完成约5%记录一次
+                            logger.info(
+                                f"FFmpeg进度: {progress:.1f}% | "
+                                f"时间: {current_time_sec:.1f}/{total_duration:.1f}秒 | "
+                                f"帧: {current_frame}/{total_frames} | "
+                                f"速度: {speed:.1f}x | "
+                                f"FPS: {fps:.1f} | "
+                                f"预计剩余: {eta_str}"
                             )
-                            
-                            # 记录日志（不那么频繁）
-                            if current_frame - last_frame >= total_frames / 20:  # 每完成约5%记录一次
-                                logger.info(
-                                    f"FFmpeg进度: {progress:.1f}% | "
-                                    f"时间: {time_str}/{total_duration:.1f}秒 | "
-                                    f"帧: {current_frame}/{total_frames} | "
-                                    f"速度: {speed:.1f}x | "
-                                    f"FPS: {fps:.1f} | "
-                                    f"预计剩余: {eta_str}"
-                                )
-                                last_frame = current_frame
+                            last_frame = current_frame
+                    block.clear()
                     
                 # 处理完成，关闭进度条
                 pbar.update(100 - last_progress)  # 确保进度达到100%
@@ -384,6 +387,9 @@ class PerformanceMonitor:
                     pbar.close()
                 except:
                     pass
+            finally:
+                if progress_pipe is not process.stderr:
+                    progress_pipe.close()
             
         # 创建并启动监控线程
         monitor_thread = threading.Thread(target=progress_monitor_thread)
@@ -23,6 +23,7 @@ from .frame_processors import (
     init_shared_memory,
     cleanup_shared_memory,
     init_worker,
+    init_worker_runtime,
     test_worker_shared_memory
 )
 from .utils import limit_resources, emergency_cleanup, get_memory_usage, optimize_memory, time_tracker
@@ -40,6 +41,7 @@ __all__ = [
     "init_shared_memory",
     "cleanup_shared_memory",
     "init_worker",
+    "init_worker_runtime",
     "test_worker_shared_memory",
     "limit_resources",
     "log_system_info",
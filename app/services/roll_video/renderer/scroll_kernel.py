@@ -0,0 +1,135 @@
+"""滚动帧内核模块
+
+滚动视频的每一帧都是源图像从某个偏移量开始的一个窗口，
+这里提供把该窗口直接写入调用方预分配输出缓冲区的内核。
+"""
+
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    from numba import njit, prange
+
+    @njit(parallel=True, fastmath=True, cache=True, nogil=True)
+    def scroll_into(img, out, offset, fill):
+        """
+        使用Numba加速，将源图像自offset行起的窗口写入输出帧
+
+        Args:
+            img: 源图像 (H, W, C) uint8
+            out: 预分配的输出帧 (h, w, C) uint8
+            offset: 起始行偏移量
+            fill: 超出源图像部分的填充颜色 (C,) uint8
+        """
+        out_h, out_w, channels = out.shape
+        img_h = img.shape[0]
+        copy_w = min(out_w, img.shape[1])
+        for y in prange(out_h):
+            sy = offset + y
+            if sy < img_h:
+                for x in range(copy_w):
+                    for c in range(channels):
+                        out[y, x, c] = img[sy, x, c]
+                for x in range(copy_w, out_w):
+                    for c in range(channels):
+                        out[y, x, c] = fill[c]
+            else:
+                for x in range(out_w):
+                    for c in range(channels):
+                        out[y, x, c] = fill[c]
+        return out
+
+    @njit(fastmath=True, cache=True, nogil=True)
+    def scroll_into_serial(img, out, offset, fill):
+        """
+        scroll_into的单线程版本，供多个Python线程同时调用
+
+        并行内核在workqueue线程层下不能从多个线程并发启动，
+        分段并行编码时由各分段线程调用本版本（nogil，线程间仍可并行）
+        """
+        out_h, out_w, channels = out.shape
+        img_h = img.shape[0]
+        copy_w = min(out_w, img.shape[1])
+        for y in range(out_h):
+            sy = offset + y
+            if sy < img_h:
+                for x in range(copy_w):
+                    for c in range(channels):
+                        out[y, x, c] = img[sy, x, c]
+                for x in range(copy_w, out_w):
+                    for c in range(channels):
+                        out[y, x, c] = fill[c]
+            else:
+                for x in range(out_w):
+                    for c in range(channels):
+                        out[y, x, c] = fill[c]
+        return out
+
+    @njit(parallel=True, fastmath=True, cache=True, nogil=True)
+    def scroll_batch_into(img, ring, ys, slots, fill):
+        """
+        使用Numba加速，一次调用把一批帧写入帧环的指定槽位
+
+        Args:
+            img: 源图像 (H, W, C) uint8
+            ring: 帧环 (N, h, w, C) uint8
+            ys: 每帧的起始行偏移量 (n,) int64
+            slots: 每帧写入的槽位序号 (n,) int64
+            fill: 超出源图像部分的填充颜色 (C,) uint8
+        """
+        out_h, out_w, channels = ring.shape[1], ring.shape[2], ring.shape[3]
+        img_h = img.shape[0]
+        copy_w = min(out_w, img.shape[1])
+        for i in prange(ys.shape[0]):
+            out = ring[slots[i]]
+            offset = ys[i]
+            for y in range(out_h):
+                sy = offset + y
+                if sy < img_h:
+                    for x in range(copy_w):
+                        for c in range(channels):
+                            out[y, x, c] = img[sy, x, c]
+                    for x in range(copy_w, out_w):
+                        for c in range(channels):
+                            out[y, x, c] = fill[c]
+                else:
+                    for x in range(out_w):
+                        for c in range(channels):
+                            out[y, x, c] = fill[c]
+        return ring
+
+    NUMBA_AVAILABLE = True
+except ImportError:
+    def scroll_into(img, out, offset, fill):
+        """普通的滚动帧复制（无Numba）"""
+        out_h, out_w = out.shape[:2]
+        copy_h = max(0, min(out_h, img.shape[0] - offset))
+        copy_w = min(out_w, img.shape[1])
+        out[:copy_h, :copy_w] = img[offset:offset + copy_h, :copy_w]
+        out[:copy_h, copy_w:] = fill
+        out[copy_h:] = fill
+        return out
+
+    scroll_into_serial = scroll_into
+
+    def scroll_batch_into(img, ring, ys, slots, fill):
+        """普通的批量滚动帧复制（无Numba）"""
+        for offset, slot in zip(ys, slots):
+            scroll_into(img, ring[slot], offset, fill)
+        return ring
+
+    NUMBA_AVAILABLE = False
+    logger.warning("Numba未安装，滚动帧将使用NumPy复制并回退到多进程渲染")
+
+
+def warmup_scroll_kernel(channels):
+    """用极小的数组预先触发JIT编译，避免首帧承担编译延迟"""
+    img = np.zeros((2, 2, channels), dtype=np.uint8)
+    out = np.empty((1, 2, channels), dtype=np.uint8)
+    fill = np.zeros(channels, dtype=np.uint8)
+    scroll_into(img, out, 0, fill)
+    scroll_into_serial(img, out, 0, fill)
+    zeros = np.zeros(1, dtype=np.int64)
+    scroll_batch_into(img, out[np.newaxis], zeros, zeros, fill)
@@ -14,31 +14,533 @@ import multiprocessing as mp
 from PIL import Image
 from typing import Dict, Tuple, List, Optional, Union
 import platform
-from collections import defaultdict
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 import psutil
 import traceback
 import signal
+import select
 from multiprocessing import shared_memory
 import random
 import string
 import re
+import contextlib
+import functools
+import tempfile
 
 from .memory_management import FrameMemoryPool, SharedMemoryFramePool, FrameBuffer
 from .performance import PerformanceMonitor
+from . import frame_processors
 from .frame_processors import (
     _process_frame,
     _process_frame_optimized,
     _process_frame_optimized_shm,
-    fast_frame_processor,
+    _process_frame_into_slot,
     init_shared_memory,
     cleanup_shared_memory,
     init_worker,
+    init_worker_runtime,
     test_worker_shared_memory,
 )
+from .scroll_kernel import scroll_into, scroll_into_serial, scroll_batch_into, warmup_scroll_kernel, NUMBA_AVAILABLE
 from .utils import time_tracker, get_memory_usage, optimize_memory, emergency_cleanup
 
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:  # Windows
+    HAS_FCNTL = False
+
 logger = logging.getLogger(__name__)
 
+# 运行环境在进程生命周期内不变，导入时查询一次
+_SYSTEM = platform.system()
+_IS_MACOS = _SYSTEM == "Darwin"
+_CPU_COUNT = mp.cpu_count()
+
+# 写入FFmpeg前累积的字节数阈值，合并小帧以减少系统调用
+PIPE_WRITE_BATCH_BYTES = 2 * 1024 * 1024
+# 单次聚集写入最多包含的帧数（写入线程同时持有的未写出帧上限）
+WRITEV_BATCH_FRAMES = 8
+# 超过该时长（秒）且CPU核心数足够时，分段并行编码
+SEGMENT_MIN_DURATION = 30
+# 并行编码的最大分段数
+MAX_PARALLEL_SEGMENTS = 4
+# 透明帧超出源图像部分的填充值
+_TRANSPARENT_FILL = np.zeros(4, dtype=np.uint8)
+# libx264预设对应的NVENC预设（p1最快，p7质量最高）
+_NVENC_PRESETS = {
+    "ultrafast": "p1",
+    "superfast": "p1",
+    "veryfast": "p2",
+    "faster": "p3",
+    "fast": "p3",
+    "medium": "p4",
+    "slow": "p5",
+    "slower": "p6",
+    "veryslow": "p7",
+}
+# 按优先级排列的H.264硬件编码器
+_HW_ENCODERS = ("h264_nvenc", "h264_qsv", "h264_vaapi")
+# VAAPI使用的渲染设备
+_VAAPI_DEVICE = "/dev/dri/renderD128"
+# 性能报告的分隔线和日志模板（%格式，由logging按需格式化）
+_STATS_SEP = "=" * 50
+_RENDER_REPORT_TEMPLATE = (
+    f"\n{_STATS_SEP}\n视频渲染性能报告:\n"
+    "1. 准备阶段: %.2f秒 (%.1f%%)\n"
+    "2. 帧处理阶段: %.2f秒 (%.1f%%) - %.2f帧/秒\n"
+    "3. 视频编码阶段: %.2f秒 (%.1f%%)\n"
+    f"总时间: %.2f秒，处理 %d 帧\n{_STATS_SEP}"
+)
+_FFMPEG_STATS_TEMPLATE = (
+    f"\n{_STATS_SEP}\n滚动视频生成性能统计 (FFmpeg滤镜方式):\n"
+    "1. 准备阶段: %.2f秒 (%.1f%%)\n"
+    "2. FFmpeg编码: %.2f秒 (%.1f%%)\n"
+    f"总时间: %.2f秒, 估算帧率: %.1f帧/秒\n{_STATS_SEP}\n"
+)
+# Linux下期望的管道容量（默认仅64KiB），实际取系统允许的最大值
+PIPE_BUFFER_SIZE = 1 << 20
+
+
+def _max_pipe_size():
+    """读取系统允许的最大管道容量，读取失败时使用默认值"""
+    try:
+        with open("/proc/sys/fs/pipe-max-size") as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return PIPE_BUFFER_SIZE
+
+
+def _enlarge_pipe_buffer(fd, size=None):
+    """在Linux上扩大管道容量，使大块写入不必频繁阻塞
+
+    Python的bufsize只决定Popen内部缓冲区大小，管道本身的容量由内核决定
+    （Linux默认64KiB）。Windows匿名管道容量为4KiB且无法调整，只能依靠
+    批量写入和长视频分段并行编码来摊薄阻塞。
+    """
+    if not HAS_FCNTL or _SYSTEM != "Linux":
+        return
+    try:
+        # F_SETPIPE_SZ 在 Python 3.10 之前未导出，值为1031
+        fcntl.fcntl(fd, getattr(fcntl, "F_SETPIPE_SZ", 1031), size or _max_pipe_size())
+    except OSError as e:
+        logger.debug(f"设置管道容量失败: {e}")
+
+
+def _write_to_pipe(fd, data):
+    """将数据零拷贝写入管道文件描述符
+
+    直接对数据的内存视图调用os.write，避免tobytes()的整帧复制；
+    管道写入可能只写入部分数据，因此循环直到全部写完。
+    """
+    view = memoryview(data).cast("B")
+    total = len(view)
+    written = 0
+    while written < total:
+        written += os.write(fd, view[written:])
+
+
+def _writev_to_pipe(fd, buffers):
+    """将多段数据通过一次聚集写入系统调用写入管道
+
+    os.writev可能只写入部分数据，剩余部分继续写入；
+    不支持writev的平台（Windows）回退为拼接后单次写入。
+    """
+    views = [memoryview(buf).cast("B") for buf in buffers]
+    if not hasattr(os, "writev"):
+        _write_to_pipe(fd, b"".join(views))
+        return
+    while views:
+        written = os.writev(fd, views)
+        # 跳过已完整写出的段，截断写了一部分的段
+        while views and written >= len(views[0]):
+            written -= len(views[0])
+            views.pop(0)
+        if views and written:
+            views[0] = views[0][written:]
+
+
+def _pipe_writer_loop(batch_queue, fd, failed, free_slots=None):
+    """写入线程：逐批取出 (帧列表, 槽位列表)，每批通过一次聚集写入交给FFmpeg，收到None时退出
+
+    帧来自共享内存帧环时，写出后把槽位归还到free_slots；
+    写入失败后设置failed并继续消费队列，避免生产端阻塞在put上。
+    """
+    while True:
+        item = batch_queue.get()
+        if item is None:
+            break
+        batch, slots = item
+        if not failed.is_set():
+            try:
+                _writev_to_pipe(fd, batch)
+            except OSError as e:
+                logger.error(f"写入帧数据时出错: {e}")
+                failed.set()
+        for slot in slots:
+            free_slots.put(slot)
+
+
+def _render_into_ring(img, ring, ys, free_slots, fill, chunk_frames):
+    """用批量滚动内核把帧渲染到帧环的空闲槽位，逐帧产出 (帧, 槽位)
+
+    每次取chunk_frames个空闲槽位并调用一次内核；取不到槽位时等待写入线程归还。
+    """
+    for start in range(0, len(ys), chunk_frames):
+        part = ys[start:start + chunk_frames]
+        slots = np.array([free_slots.get() for _ in range(len(part))], dtype=np.int64)
+        scroll_batch_into(img, ring, part, slots, fill)
+        for slot in slots.tolist():
+            yield ring[slot], slot
+
+
+def _drain_stderr(pipe, tail, label="FFmpeg"):
+    """读取FFmpeg的stderr直到管道关闭，防止缓冲区满导致FFmpeg阻塞
+
+    按块读取而不是逐行读取，先在整块上查找error/warning，只有命中时才解码并逐行记录；
+    最后几行保存在tail中，供FFmpeg失败时输出。
+    """
+    fd = pipe.fileno()
+    partial = b""  # 尚未结束的半行
+    try:
+        while True:
+            data = os.read(fd, 65536)
+            if not data:
+                break
+            lines = (partial + data).replace(b"\r", b"\n").split(b"\n")
+            partial = lines.pop()
+            tail.extend(line for line in lines if line)
+            lowered = data.lower()
+            if b"error" in lowered or b"warning" in lowered:
+                for line in lines:
+                    lowered_line = line.lower()
+                    if b"error" in lowered_line or b"warning" in lowered_line:
+                        logger.warning(f"{label}: {line.decode('utf-8', errors='replace').strip()}")
+        if partial:
+            tail.append(partial)
+    except Exception as e:
+        logger.error(f"读取{label} stderr时出错: {str(e)}")
+    finally:
+        pipe.close()
+
+
+def _stop_process(process, timeout=2):
+    """终止仍在运行的FFmpeg进程：先terminate，超时未退出再kill，并回收进程"""
+    if process.poll() is not None:
+        return
+    try:
+        process.terminate()
+        try:
+            process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            logger.warning("FFmpeg进程未响应terminate()，强制终止(kill)")
+            process.kill()
+            process.wait()
+    except OSError as e:
+        logger.error(f"终止FFmpeg进程失败: {e}")
+
+
+def _temp_dir_beside(output_path):
+    """在输出文件所在目录创建临时目录：其中的文件可直接os.replace到最终位置，退出时整体删除"""
+    return tempfile.TemporaryDirectory(
+        prefix="rollvid_", dir=os.path.dirname(os.path.abspath(output_path))
+    )
+
+
+def _rgb_to_yuv420p(rgb, chunk_rows=1024):
+    """
+    将RGB图像转换为yuv420p平面数据（BT.601有限范围，与FFmpeg的默认转换一致）
+
+    色度取2x2像素的平均值；按行分块计算，限制整型中间数组的内存占用。
+    图像宽高须为偶数。
+
+    Args:
+        rgb: RGB图像 (H, W, 3) uint8
+        chunk_rows: 每块处理的行数（偶数）
+
+    Returns:
+        一维uint8数组，依次为Y、U、V三个平面
+    """
+    height, width = rgb.shape[:2]
+    luma_size = height * width
+    chroma_size = luma_size // 4
+    out = np.empty(luma_size + 2 * chroma_size, dtype=np.uint8)
+    y_plane = out[:luma_size].reshape(height, width)
+    u_plane = out[luma_size:luma_size + chroma_size].reshape(height // 2, width // 2)
+    v_plane = out[luma_size + chroma_size:].reshape(height // 2, width // 2)
+
+    for start in range(0, height, chunk_rows):
+        block = rgb[start:start + chunk_rows].astype(np.int32)
+        rows = block.shape[0]
+        r, g, b = block[..., 0], block[..., 1], block[..., 2]
+        y_plane[start:start + rows] = ((66 * r + 129 * g + 25 * b + 128) >> 8) + 16
+
+        # 2x2像素求和后换算，移位多除以4
+        quad = block.reshape(rows // 2, 2, width // 2, 2, 3).sum(axis=(1, 3))
+        r, g, b = quad[..., 0], quad[..., 1], quad[..., 2]
+        u_plane[start // 2:(start + rows) // 2] = ((-38 * r - 74 * g + 112 * b + 512) >> 10) + 128
+        v_plane[start // 2:(start + rows) // 2] = ((112 * r - 94 * g - 18 * b + 512) >> 10) + 128
+    return out
+
+
+def _format_tail(tail):
+    """将保存的stderr末尾几行拼接为日志文本"""
+    return "\n".join(line.decode("utf-8", errors="replace").strip() for line in tail)
+
+
+def _wait_for_exit(process, timeout):
+    """阻塞等待子进程退出，最多等待timeout秒，返回进程是否已退出
+
+    Linux上等待pidfd可读、macOS上等待kqueue的进程退出事件，进程退出时立即唤醒，
+    无需定时轮询；其他平台回退到Popen.wait。
+    """
+    if process.poll() is not None:
+        return True
+    timeout = max(0.0, timeout)
+    try:
+        if hasattr(os, "pidfd_open"):
+            pidfd = os.pidfd_open(process.pid)
+            try:
+                poller = select.poll()
+                poller.register(pidfd, select.POLLIN)
+                if not poller.poll(timeout * 1000):
+                    return False
+            finally:
+                os.close(pidfd)
+            process.wait()
+            return True
+        if hasattr(select, "kqueue"):
+            kq = select.kqueue()
+            try:
+                event = select.kevent(
+                    process.pid,
+                    filter=select.KQ_FILTER_PROC,
+                    flags=select.KQ_EV_ADD | select.KQ_EV_ONESHOT,
+                    fflags=select.KQ_NOTE_EXIT,
+                )
+                if not kq.control([event], 1, timeout):
+                    return False
+            finally:
+                kq.close()
+            process.wait()
+            return True
+    except ProcessLookupError:
+        # 进程已退出并被回收
+        process.wait()
+        return True
+    except OSError as e:
+        logger.debug(f"等待进程退出事件失败，回退到Popen.wait: {e}")
+
+    try:
+        process.wait(timeout=timeout)
+        return True
+    except subprocess.TimeoutExpired:
+        return False
+
+
+def _try_encode(args):
+    """用FFmpeg编码一帧测试画面，返回是否成功"""
+    result = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error"] + args + ["-frames:v", "1", "-f", "null", "-"],
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=5,
+    )
+    return result.returncode == 0
+
+
+@functools.lru_cache(maxsize=1)
+def _probe_hw_encoders():
+    """
+    检测可用的H.264硬件编码器，结果在进程生命周期内缓存
+
+    先用一次ffmpeg -encoders确认FFmpeg编译了哪些硬件编码器，再确认对应硬件存在：
+    NVENC检查nvidia-smi，QSV和VAAPI试编码一帧（编译进FFmpeg不代表有可用的设备），
+    避免每次渲染都启动检测进程（无GPU的机器上还要等待超时）
+
+    Returns:
+        frozenset: 可用的硬件编码器名称
+    """
+    try:
+        result = subprocess.run(
+            ["ffmpeg", "-hide_banner", "-encoders"],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=2,
+        )
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.info(f"硬件编码器检测出错: {e}，将使用CPU处理")
+        return frozenset()
+
+    available = set()
+    test_input = ["-f", "lavfi", "-i", "color=c=black:s=256x256"]
+    for encoder in _HW_ENCODERS:
+        if encoder.encode() not in result.stdout:
+            continue
+        try:
+            if encoder == "h264_nvenc":
+                usable = subprocess.run(
+                    ["nvidia-smi"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=2,
+                ).returncode == 0
+            elif encoder == "h264_vaapi":
+                usable = os.path.exists(_VAAPI_DEVICE) and _try_encode(
+                    _hw_encoder_parameters(encoder, "veryfast")[1] + test_input
+                    + ["-vf", "format=nv12,hwupload", "-c:v", encoder]
+                )
+            else:
+                usable = _try_encode(test_input + ["-c:v", encoder])
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.info(f"{encoder}检测出错: {e}")
+            usable = False
+        if usable:
+            available.add(encoder)
+
+    if available:
+        logger.info(f"检测到可用的硬件编码器: {', '.join(sorted(available))}")
+    return frozenset(available)
+
+
+def _hw_encoder_parameters(encoder, encoder_preset):
+    """
+    硬件编码器的参数
+
+    输入是rawvideo，不需要-hwaccel硬件解码；帧在crop之后上传到GPU，
+    由GPU完成像素格式转换后交给编码器
+
+    Args:
+        encoder: 硬件编码器名称（_HW_ENCODERS之一）
+        encoder_preset: libx264预设名，映射为对应编码器的预设
+
+    Returns:
+        (codec_params, device_args, filter_suffix): 编码参数、放在输入之前的设备初始化参数、
+        接在crop滤镜之后的滤镜
+    """
+    if encoder == "h264_nvenc":
+        codec_params = [
+            "-c:v", "h264_nvenc",
+            "-preset", _NVENC_PRESETS.get(encoder_preset, "p4"),
+            "-tune", "ll",  # 低延迟调优，不使用B帧
+            "-rc", "vbr",
+            "-cq", "28",
+            "-b:v", "4M",
+        ]
+        # hwupload_cuda不接受24位packed RGB，先在CPU上补齐为rgb0（仅字节重排），
+        # 上传后由scale_cuda转换为yuv420p
+        return codec_params + ["-movflags", "+faststart"], [], ",format=rgb0,hwupload_cuda,scale_cuda=format=yuv420p"
+    if encoder == "h264_qsv":
+        # QSV没有ultrafast/superfast预设，最快为veryfast
+        qsv_preset = "veryfast" if encoder_preset in ("ultrafast", "superfast") else encoder_preset
+        codec_params = [
+            "-c:v", "h264_qsv",
+            "-preset", qsv_preset,
+            "-global_quality", "25",
+            "-movflags", "+faststart",
+        ]
+        return codec_params, [], ",format=nv12"
+    # h264_vaapi：初始化VAAPI设备，滤镜链中hwupload上传到该设备
+    codec_params = [
+        "-c:v", "h264_vaapi",
+        "-qp", "25",
+        "-movflags", "+faststart",
+    ]
+    device_args = ["-init_hw_device", f"vaapi=va:{_VAAPI_DEVICE}", "-filter_hw_device", "va"]
+    return codec_params, device_args, ",format=nv12,hwupload"
+
+
+@functools.lru_cache(maxsize=None)
+def _codec_parameters(preferred_codec, transparency_required, channels, force_cpu, system_name,
+                      encoder_preset="ultrafast", crf=23):
+    """
+    按参数组合缓存的编码器参数计算，运行期间结果不会变化
+
+    encoder_preset为libx264预设名，NVENC使用_NVENC_PRESETS中对应的预设；
+    crf为libx264的恒定质量因子
+
+    Returns:
+        (codec_params, pix_fmt): 编码器参数元组和像素格式
+    """
+    # 检查系统平台
+    is_macos = system_name == "Darwin"
+    is_windows = system_name == "Windows"
+    is_linux = system_name == "Linux"
+    
+    # 透明背景需要特殊处理
+    if transparency_required or channels == 4:
+        # 透明背景需要特殊处理
+        pix_fmt = "rgba"
+        # ProRes 4444保留Alpha
+        codec_params = [
+            "-c:v", "prores_ks", 
+            "-profile:v", "4444",
+            "-pix_fmt", "yuva444p10le", 
+            "-alpha_bits", "16",
+            "-vendor", "ap10", 
+            "-colorspace", "bt709",
+        ]
+        logger.info("使用ProRes 4444编码器处理透明视频")
+        return tuple(codec_params), pix_fmt
+    
+    # 不透明视频处理
+    pix_fmt = "rgb24"
+    
+    # 根据平台和编码器选择参数
+    if preferred_codec == "h264_nvenc" and not force_cpu:
+        # NVIDIA GPU加速
+        if is_windows or is_linux:
+            codec_params = [
+                # RGB→YUV转换放到GPU上完成：hwupload_cuda不接受24位packed RGB，
+                # 先在CPU上补齐为rgb0（仅字节重排），再上传并由scale_cuda转换为yuv420p
+                "-vf", "format=rgb0,hwupload_cuda,scale_cuda=format=yuv420p",
+                "-c:v", "h264_nvenc",
+                "-preset", _NVENC_PRESETS.get(encoder_preset, "p4"),
+                "-tune", "ll",  # 低延迟调优，不使用B帧
+                "-rc", "vbr", 
+                "-cq", "28",  # 更低的质量以提高速度
+                "-b:v", "4M",
+                "-movflags", "+faststart",
+            ]
+            logger.info("使用NVIDIA GPU加速编码器 (优化性能模式)")
+        else:
+            # 不支持NVIDIA，回退到CPU
+            logger.info("平台不支持NVIDIA编码，切换到libx264")
+            codec_params = [
+                "-c:v", "libx264",
+                "-preset", encoder_preset,
+                "-crf", str(crf),
+                "-pix_fmt", "yuv420p",
+                "-movflags", "+faststart",
+            ]
+    elif preferred_codec == "h264_videotoolbox":
+        # 删除VideoToolbox相关分支，使用libx264代替
+        logger.info("不支持VideoToolbox，使用libx264")
+        codec_params = [
+            "-c:v", "libx264",
+            "-preset", encoder_preset,
+            "-crf", str(crf),
+            "-pix_fmt", "yuv420p",
+            "-movflags", "+faststart",
+        ]
+    elif preferred_codec == "prores_ks":
+        # ProRes (非透明)
+        codec_params = [
+            "-c:v", "prores_ks",
+            "-profile:v", "3",  # ProRes 422 HQ
+            "-pix_fmt", "yuv422p10le",
+            "-vendor", "ap10",
+            "-colorspace", "bt709",
+        ]
+        logger.info("使用ProRes编码器 (非透明)")
+    else:
+        # 默认使用libx264 (CPU编码)
+        codec_params = [
+            "-c:v", "libx264",
+            "-preset", encoder_preset,  # 滚动文字画面简单，默认ultrafast即可
+            "-crf", str(crf),           # 恒定质量因子 (0-51, 越低质量越高)
+            "-pix_fmt", "yuv420p", # 兼容大多数播放器
+            "-movflags", "+faststart", # MP4优化
+        ]
+        logger.info(f"使用CPU编码器: libx264，预设: {encoder_preset}，CRF: {crf}")
+    
+    return tuple(codec_params), pix_fmt
+
 
 class VideoRenderer:
     """视频渲染器，负责创建滚动效果的视频，使用ffmpeg管道和线程读取优化"""
@@ -49,6 +551,8 @@ class VideoRenderer:
         height: int,
         fps: int = 30,
         scroll_speed: int = 5,  # 每帧滚动的像素数（由service层基于行高和每秒滚动行数计算而来）
+        encoder_preset: str = "ultrafast",
+        crf: int = 23,
     ):
         """
         初始化视频渲染器
@@ -58,12 +562,19 @@ class VideoRenderer:
             height: 视频高度
             fps: 视频帧率
             scroll_speed: 每帧滚动的像素数（由service层基于行高和每秒滚动行数计算而来）
+            encoder_preset: libx264编码预设，NVENC使用对应的p1-p7预设
+            crf: libx264恒定质量因子 (0-51, 越低质量越高)
         """
         self.width = width
         self.height = height
         self.fps = fps
         self.scroll_speed = scroll_speed
+        self.encoder_preset = encoder_preset
+        self.crf = crf
         self.memory_pool = None
+        self._out_buffers = None  # 预分配的输出帧轮换缓冲区，跨渲染复用
+        self._pool = None  # 跨渲染复用的spawn进程池
+        self._pool_size = 0
         self.frame_counter = 0
         self.total_frames = 0
         
@@ -77,6 +588,53 @@ class VideoRenderer:
             "fps": 0,                   # 平均每秒处理的帧数
         }
 
+    def _get_process_pool(self, pool_size, shared_dict):
+        """
+        获取跨渲染复用的spawn进程池，并把本次渲染的共享内存信息下发到每个工作进程
+
+        spawn启动的工作进程需要重新导入numpy和项目模块，创建代价较高，
+        因此进程池只在首次使用或规模变化时创建。
+
+        Args:
+            pool_size: 工作进程数
+            shared_dict: 本次渲染的共享内存信息字典
+
+        Returns:
+            进程池
+        """
+        if self._pool is not None and self._pool_size == pool_size:
+            try:
+                if all(self._pool.map(init_worker_runtime, [shared_dict] * pool_size, chunksize=1)):
+                    logger.info(f"复用{pool_size}个进程的进程池")
+                    return self._pool
+            except Exception as e:
+                logger.warning(f"复用进程池出错: {e}")
+            logger.warning("进程池重新绑定失败，重新创建进程池")
+
+        self.close()
+        mp_context = mp.get_context("spawn")
+        barrier = mp_context.Barrier(pool_size)
+        self._pool = mp_context.Pool(
+            processes=pool_size, initializer=init_worker, initargs=(shared_dict, barrier)
+        )
+        self._pool_size = pool_size
+        logger.info(f"创建{pool_size}个进程的进程池")
+        return self._pool
+
+    def close(self):
+        """关闭复用的进程池"""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+            self._pool_size = 0
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
     def _init_memory_pool(self, channels=3, pool_size=120):
         """
         初始化内存池，预分配帧缓冲区
@@ -105,6 +663,23 @@ class VideoRenderer:
                 self._init_memory_pool(channels, 30)
         return self.memory_pool
 
+    def _init_output_buffers(self, channels, count):
+        """
+        预分配输出帧轮换缓冲区，尺寸和数量不变时直接复用上次分配的缓冲区
+
+        Args:
+            channels: 通道数，3表示RGB，4表示RGBA
+            count: 缓冲区数量（需覆盖写入队列和写入线程持有的帧）
+        """
+        shape = (self.height, self.width, channels)
+        if (
+            self._out_buffers is None
+            or len(self._out_buffers) != count
+            or self._out_buffers[0].shape != shape
+        ):
+            self._out_buffers = [np.empty(shape, dtype=np.uint8) for _ in range(count)]
+        return self._out_buffers
+
     def _get_codec_parameters(self, preferred_codec, transparency_required, channels):
         """
         获取适合当前平台和需求的编码器参数
@@ -117,89 +692,14 @@ class VideoRenderer:
         Returns:
             (codec_params, pix_fmt): 编码器参数列表和像素格式
         """
-        # 检查系统平台
-        is_macos = platform.system() == "Darwin"
-        is_windows = platform.system() == "Windows"
-        is_linux = platform.system() == "Linux"
-        
-        # 透明背景需要特殊处理
-        if transparency_required or channels == 4:
-            # 透明背景需要特殊处理
-            pix_fmt = "rgba"
-            # ProRes 4444保留Alpha
-            codec_params = [
-                "-c:v", "prores_ks", 
-                "-profile:v", "4444",
-                "-pix_fmt", "yuva444p10le", 
-                "-alpha_bits", "16",
-                "-vendor", "ap10", 
-                "-colorspace", "bt709",
-            ]
-            logger.info("使用ProRes 4444编码器处理透明视频")
-            return codec_params, pix_fmt
-        
-        # 不透明视频处理
-        pix_fmt = "rgb24"
-        
-        # 检查是否强制使用CPU
-        force_cpu = "NO_GPU" in os.environ
-        
-        # 根据平台和编码器选择参数
-        if preferred_codec == "h264_nvenc" and not force_cpu:
-            # NVIDIA GPU加速
-            if is_windows or is_linux:
-                codec_params = [
-                    "-c:v", "h264_nvenc",
-                    "-preset", "p1",  # 使用最快的预设
-                    "-rc", "vbr", 
-                    "-cq", "28",  # 更低的质量以提高速度
-                    "-b:v", "4M",
-                    "-pix_fmt", "yuv420p",
-                    "-movflags", "+faststart",
-                ]
-                logger.info("使用NVIDIA GPU加速编码器 (优化性能模式)")
-            else:
-                # 不支持NVIDIA，回退到CPU
-                logger.info("平台不支持NVIDIA编码，切换到libx264")
-                codec_params = [
-                    "-c:v", "libx264",
-                    "-preset", "veryfast",  # 使用更快的预设
-                    "-crf", "20",  # 略微降低质量以提高速度
-                    "-pix_fmt", "yuv420p",
-                    "-movflags", "+faststart",
-                ]
-        elif preferred_codec == "h264_videotoolbox":
-            # 删除VideoToolbox相关分支，使用libx264代替
-            logger.info("不支持VideoToolbox，使用libx264")
-            codec_params = [
-                "-c:v", "libx264",
-                "-preset", "veryfast",
-                "-crf", "20",
-                "-pix_fmt", "yuv420p",
-                "-movflags", "+faststart",
-            ]
-        elif preferred_codec == "prores_ks":
-            # ProRes (非透明)
-            codec_params = [
-                "-c:v", "prores_ks",
-                "-profile:v", "3",  # ProRes 422 HQ
-                "-pix_fmt", "yuv422p10le",
-                "-vendor", "ap10",
-                "-colorspace", "bt709",
-            ]
-            logger.info("使用ProRes编码器 (非透明)")
-        else:
-            # 默认使用libx264 (高质量CPU编码)
-            codec_params = [
-                "-c:v", "libx264",
-                "-preset", "medium",  # 平衡速度和质量的预设
-                "-crf", "20",         # 恒定质量因子 (0-51, 越低质量越高)
-                "-pix_fmt", "yuv420p", # 兼容大多数播放器
-                "-movflags", "+faststart", # MP4优化
-            ]
-            logger.info(f"使用CPU编码器: libx264")
-        
-        return codec_params, pix_fmt
+        codec_params, pix_fmt = _codec_parameters(
+            preferred_codec, transparency_required, channels,
+            "NO_GPU" in os.environ,  # 是否强制使用CPU
+            _SYSTEM,
+            self.encoder_preset,
+            self.crf,
+        )
+        return list(codec_params), pix_fmt
 
     def _get_ffmpeg_command(
         self,
@@ -209,14 +709,11 @@ class VideoRenderer:
         audio_path: Optional[str],
     ) -> List[str]:
         """构造基础的ffmpeg命令 - 高性能优化版"""
+        has_audio = bool(audio_path and os.path.exists(audio_path))
         command = [
             "ffmpeg",
             "-y",
-            # I/O优化参数
-            "-probesize",
-            "20M",  # 增加探测缓冲区大小
-            "-analyzeduration",
-            "20M",  # 增加分析时间
+            # I/O优化参数（rawvideo没有容器可探测，无需probesize/analyzeduration）
             "-thread_queue_size",
             "8192",  # 大幅增加线程队列大小
             # 输入格式参数
@@ -230,18 +727,21 @@ class VideoRenderer:
             pix_fmt,
             "-r",
             str(self.fps),
-            "-vsync",
-            "1",  # 添加vsync参数，确保平滑的视频同步
+            "-fflags",
+            "+genpts",  # 按输入帧率生成时间戳
             "-i",
             "-",  # 从 stdin 读取
         ]
-        if audio_path and os.path.exists(audio_path):
+        if has_audio:
             command.extend(["-i", audio_path])
 
+        # 输入帧与输出帧一一对应，跳过帧率校正（不复制/丢弃帧）
+        command.extend(["-fps_mode", "passthrough"])
+
         # 添加视频编码器和特定的输出参数 (如 -movflags)
         command.extend(codec_and_output_params)
 
-        if audio_path and os.path.exists(audio_path):
+        if has_audio:
             command.extend(
                 ["-c:a", "aac", "-map", "0:v:0", "-map", "1:a:0", "-shortest"]
             )
@@ -260,6 +760,220 @@ class VideoRenderer:
         finally:
             output_queue.put(None)  # 发送结束信号
 
+    def _encode_segment(self, ffmpeg_cmd, frame_indices, render_frame, channels, progress, seg_idx):
+        """
+        编码一个视频分段：在当前线程中逐帧生成并聚集写入该分段自己的FFmpeg进程
+
+        Args:
+            ffmpeg_cmd: 该分段的FFmpeg命令
+            frame_indices: 该分段包含的帧索引范围
+            render_frame: 帧生成函数 (帧索引, 输出缓冲区) -> 帧
+            channels: 通道数
+            progress: 各分段已写出帧数的列表，按seg_idx更新
+            seg_idx: 分段序号
+
+        Returns:
+            FFmpeg返回码
+        """
+        process = subprocess.Popen(
+            ffmpeg_cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            bufsize=0,
+        )
+        stderr_tail = deque(maxlen=20)
+        stderr_thread = threading.Thread(
+            target=_drain_stderr, args=(process.stderr, stderr_tail, f"分段 {seg_idx} FFmpeg"), daemon=True
+        )
+        stderr_thread.start()
+
+        stdin_fd = process.stdin.fileno()
+        _enlarge_pipe_buffer(stdin_fd)
+        # 每个分段线程同步写出，一批帧的缓冲区写完即可复用
+        buffers = [
+            np.empty((self.height, self.width, channels), dtype=np.uint8)
+            for _ in range(WRITEV_BATCH_FRAMES)
+        ]
+        batch = []
+        try:
+            for frame_idx in frame_indices:
+                batch.append(render_frame(frame_idx, buffers[len(batch)]))
+                if len(batch) == WRITEV_BATCH_FRAMES:
+                    _writev_to_pipe(stdin_fd, batch)
+                    progress[seg_idx] += len(batch)
+                    batch = []
+            if batch:
+                _writev_to_pipe(stdin_fd, batch)
+                progress[seg_idx] += len(batch)
+        except OSError as e:
+            logger.error(f"分段 {seg_idx} 写入FFmpeg失败: {e}")
+        except BaseException:
+            # 帧生成出错或被中断：不让FFmpeg用半截输入继续编码
+            _stop_process(process)
+            raise
+        finally:
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+
+        return_code = process.wait()
+        stderr_thread.join(timeout=2)
+        if return_code != 0 and stderr_tail:
+            logger.error(f"分段 {seg_idx} FFmpeg最后输出:\n{_format_tail(stderr_tail)}")
+        return return_code
+
+    def _encode_segments_parallel(
+        self, render_frame, total_frames, channels, output_path, pix_fmt, codec_params, audio_path, segment_count
+    ):
+        """
+        将视频按帧区间切分为多个分段，由多个FFmpeg进程并行编码，再无损拼接
+
+        每一帧都只由帧索引决定，分段之间没有依赖，编码吞吐可随分段数线性提升。
+
+        Returns:
+            成功返回输出路径，失败返回None（调用方回退到单进程编码）
+        """
+        ext = os.path.splitext(output_path)[1]
+        bounds = np.linspace(0, total_frames, segment_count + 1).astype(int)
+        temp_dir = _temp_dir_beside(output_path)
+        segment_paths = [os.path.join(temp_dir.name, f"part{k}{ext}") for k in range(segment_count)]
+        list_path = os.path.join(temp_dir.name, "segments.txt")
+        progress = [0] * segment_count
+
+        logger.info(f"分段并行编码: {segment_count}个分段，共{total_frames}帧")
+        encode_start_time = time.time()
+        try:
+            pbar = tqdm(
+                total=total_frames,
+                desc=f"分段渲染视频 ({os.path.basename(output_path)})",
+                unit="帧",
+                mininterval=0.25,
+            )
+            with ThreadPoolExecutor(max_workers=segment_count) as executor:
+                futures = [
+                    executor.submit(
+                        self._encode_segment,
+                        self._get_ffmpeg_command(segment_paths[k], pix_fmt, codec_params, None),
+                        range(bounds[k], bounds[k + 1]),
+                        render_frame,
+                        channels,
+                        progress,
+                        k,
+                    )
+                    for k in range(segment_count)
+                ]
+                while not all(f.done() for f in futures):
+                    time.sleep(0.5)
+                    pbar.n = sum(progress)
+                    pbar.refresh()
+                return_codes = [f.result() for f in futures]
+            pbar.n = sum(progress)
+            pbar.close()
+
+            if any(code != 0 for code in return_codes):
+                logger.error(f"分段编码失败，返回码: {return_codes}")
+                return None
+
+            self.performance_stats["frame_processing_time"] = time.time() - encode_start_time
+            self.performance_stats["frames_processed"] = sum(progress)
+
+            # 拼接分段：视频流直接复制，不重新编码
+            concat_start_time = time.time()
+            if not self._concat_segments(segment_paths, list_path, output_path, audio_path):
+                return None
+            self.performance_stats["encoding_time"] = time.time() - concat_start_time
+            return output_path
+        finally:
+            temp_dir.cleanup()
+
+    def _concat_segments(self, segment_paths, list_path, output_path, audio_path):
+        """
+        用concat分离器无损拼接各分段（视频流直接复制），有音频时同时混入音频
+
+        Returns:
+            bool: 是否拼接成功
+        """
+        with open(list_path, "w", encoding="utf-8") as f:
+            for path in segment_paths:
+                escaped = os.path.abspath(path).replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+        concat_cmd = ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", list_path]
+        has_audio = audio_path and os.path.exists(audio_path)
+        if has_audio:
+            concat_cmd.extend(["-i", audio_path])
+        concat_cmd.extend(["-map", "0:v:0", "-c:v", "copy"])
+        if has_audio:
+            concat_cmd.extend(["-map", "1:a:0", "-c:a", "aac", "-shortest"])
+        concat_cmd.extend(["-movflags", "+faststart", output_path])
+        result = subprocess.run(
+            concat_cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+        )
+        if result.returncode != 0:
+            logger.error(f"分段拼接失败: {result.stderr.decode('utf-8', errors='replace')[-2000:]}")
+            return False
+        return True
+
+    def _encode_crop_segments_parallel(
+        self, input_args, source_frame, crop_filter, video_args, total_frames, output_path, audio_path, segment_count
+    ):
+        """
+        crop滤镜方式的分段并行编码：按帧区间切分时间轴，每段由独立的FFmpeg进程
+        以平移后的裁剪表达式编码，再无损拼接
+
+        滚动位置只由时间决定，各分段之间没有依赖。
+
+        Args:
+            input_args: 图像输入参数（不含音频），图像从stdin读入
+            source_frame: 源图像数组，写入每个分段FFmpeg的stdin
+            crop_filter: 滤镜生成函数 (分段起始时间) -> 滤镜字符串
+            video_args: 视频编码及输出参数（不含输出路径）
+            total_frames: 总帧数
+            output_path: 最终输出路径
+            audio_path: 可选的音频文件路径，拼接时混入
+            segment_count: 分段数
+
+        Returns:
+            成功返回输出路径，失败返回None（调用方回退到单进程编码）
+        """
+        ext = os.path.splitext(output_path)[1]
+        bounds = np.linspace(0, total_frames, segment_count + 1).astype(int)
+        temp_dir = _temp_dir_beside(output_path)
+        segment_paths = [os.path.join(temp_dir.name, f"part{k}{ext}") for k in range(segment_count)]
+        list_path = os.path.join(temp_dir.name, "segments.txt")
+        source_view = memoryview(source_frame).cast("B")
+
+        def encode(k):
+            start_time = time.monotonic()
+            segment_start = bounds[k] / self.fps
+            cmd = list(input_args) + [
+                "-filter_complex", crop_filter(segment_start),
+                # 按帧数而不是浮点时长截止，分段帧数之和精确等于总帧数，拼接处不会重复或丢帧
+                "-frames:v", str(bounds[k + 1] - bounds[k]),
+            ] + list(video_args) + [segment_paths[k]]
+            result = subprocess.run(
+                cmd, input=source_view, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+            )
+            if result.returncode != 0:
+                logger.error(
+                    f"分段 {k} FFmpeg失败: {result.stderr.decode('utf-8', errors='replace')[-2000:]}"
+                )
+            return result.returncode, time.monotonic() - start_time
+
+        logger.info(f"crop滤镜分段并行编码: {segment_count}个分段，共{total_frames}帧")
+        try:
+            with ThreadPoolExecutor(max_workers=segment_count) as executor:
+                results = list(executor.map(encode, range(segment_count)))
+            self.performance_stats["segment_times"] = [elapsed for _, elapsed in results]
+            if any(code != 0 for code, _ in results):
+                return None
+            if not self._concat_segments(segment_paths, list_path, output_path, audio_path):
+                return None
+            return output_path
+        finally:
+            temp_dir.cleanup()
+
     def create_scrolling_video_optimized(
         self,
         image,
@@ -300,14 +1014,17 @@ class VideoRenderer:
             # 1. 视频参数准备
             logger.info(f"准备创建滚动视频: {output_path}")
             
-            # 将图像转换为numpy数组
+            # 将图像转换为numpy数组（源图像只读使用，稍后一次性写入最终缓冲区，无需预先复制）
             if isinstance(image, np.ndarray):
-                img_array = image.copy()
+                img_array = image
                 if len(img_array.shape) == 2:  # 扩展成3通道
                     img_array = np.stack([img_array] * 3, axis=2)
             else:  # PIL.Image
-                img_array = np.array(image)
+                img_array = np.asarray(image)
                 
+            # 需要与背景色混合的RGBA图像，混合结果直接写入补边图像，不生成中间RGB数组
+            composite_bg = None
+
             # 确保图像是RGBA或RGB
             if img_array.shape[2] == 4:  # RGBA
                 # 有Alpha通道，保留透明度
@@ -316,9 +1033,6 @@ class VideoRenderer:
                     pass
                 else:
                     # 将RGBA转换为RGB（用背景色填充）
-                    rgb_array = np.zeros((img_array.shape[0], img_array.shape[1], 3), dtype=np.uint8)
-                    alpha = img_array[:, :, 3].astype(float) / 255.0
-                    
                     # 安全处理背景色，确保是RGB格式
                     if isinstance(bg_color, (list, tuple)):
                         if len(bg_color) >= 3:
@@ -328,43 +1042,18 @@ class VideoRenderer:
                     else:
                         bg_r, bg_g, bg_b = 255, 255, 255  # 默认白色
                     
-                    # 将RGB通道从RGBA转换出来，使用背景色填充
-                    rgb_array[:, :, 0] = (img_array[:, :, 0] * alpha + bg_r * (1 - alpha)).astype(np.uint8)
-                    rgb_array[:, :, 1] = (img_array[:, :, 1] * alpha + bg_g * (1 - alpha)).astype(np.uint8)
-                    rgb_array[:, :, 2] = (img_array[:, :, 2] * alpha + bg_b * (1 - alpha)).astype(np.uint8)
-                    
-                    img_array = rgb_array
+                    composite_bg = np.array([bg_r, bg_g, bg_b], dtype=np.uint16)
             
             # 获取图像尺寸和通道数
             img_height, img_width = img_array.shape[:2]
-            channels = img_array.shape[2] if len(img_array.shape) > 2 else 1
-            
-            # 2. 计算滚动参数
-            scroll_height = img_height
-            fps = 30
-            scroll_duration = max(int(scroll_height / 60), 10)  # 至少10秒
-            
-            # 至少滚动100像素，确保内容可见
-            if scroll_height < 100:
-                logger.warning(f"图像高度太小 ({scroll_height}px)，已调整为最小高度100px")
-                scroll_height = 100
+            channels = 3 if composite_bg is not None else img_array.shape[2]
             
-            # 每帧滚动的像素数
-            pixels_per_second = scroll_height / scroll_duration
-            pixels_per_frame = pixels_per_second / fps
-            
-            # 视频高度 = 实际文本高度（可视区域）
-            video_height = min(text_actual_height, 720)  # 限制最大高度
-            
-            # 计算总帧数
-            total_frames = int(fps * scroll_duration) + 1
-            
-            # 3. 确定编码器参数
+            # 2. 确定编码器参数
             codec_params, pix_fmt = self._get_codec_parameters(
                 preferred_codec, transparency_required, channels
             )
 
-            # 4. 滚动参数计算 - 减少中间变量
+            # 3. 滚动参数计算
             scroll_distance = max(text_actual_height, img_height - self.height)
             scroll_frames = (
                 int(scroll_distance / self.scroll_speed) if self.scroll_speed > 0 else 0
@@ -408,54 +1097,145 @@ class VideoRenderer:
                 except Exception as e:
                     logger.warning(f"删除旧输出文件失败: {e}")
 
-            # 5. 创建子进程池
+            # 4. 创建子进程池
             # 核心数和池大小计算
-            cpu_count = mp.cpu_count()
-            pool_size = max(2, min(cpu_count - 1, 8))  # 至少2个，最多8个，保留1个核心给主进程
+            pool_size = max(2, min(_CPU_COUNT - 1, 8))  # 至少2个，最多8个，保留1个核心给主进程
 
-            # 初始化共享内存
+            # 每一帧都是源图像的一个窗口，直接在主进程中生成：不透明视频取补边图像的连续切片，
+            # 透明视频由Numba内核写入预分配帧；仅在透明且Numba不可用时回退到进程池
+            use_process_pool = transparency_required and not NUMBA_AVAILABLE
             shm = None
-            shm_name = f"shm_image_{int(time.time())}_{random.randint(1000, 9999)}"
-            try:
-                # 创建共享内存
-                shm = shared_memory.SharedMemory(name=shm_name, create=True, size=img_array.nbytes)
-                # 创建Numpy数组视图并复制数据
-                shm_array = np.ndarray(img_array.shape, dtype=img_array.dtype, buffer=shm.buf)
-                np.copyto(shm_array, img_array)
-                logger.info(f"已将图像数据复制到共享内存 {shm_name}")
+            shm_name = None
+            shared_dict = None
+            img_padded = None
+            frame_fill = None
+
+            # 流水线容量：在途任务数上限和写入队列长度
+            max_in_flight = pool_size * 4
+            write_queue_size = pool_size * 2
+            # 进程池路径的输出帧共享内存环：工作进程直接渲染到槽位，只回传槽位序号；
+            # 槽位在写入线程写出数据后归还，数量覆盖在途任务、写入队列和写入线程持有的一批帧
+            frame_ring = []  # [(SharedMemory, 帧视图)]
+
+            # 逐帧偏移量：开头静止帧停在顶部，滚动帧按速度递增，结尾静止帧停在最终位置
+            max_offset = img_height
+            scroll_offsets = np.minimum(
+                (np.arange(scroll_frames) * self.scroll_speed).astype(np.int64), max_offset
+            )
+            final_offset = min(int(scroll_frames * self.scroll_speed), max_offset)
+            frame_offsets = np.concatenate([
+                np.zeros(padding_frames_start, dtype=np.int64),
+                scroll_offsets,
+                np.full(padding_frames_end, final_offset, dtype=np.int64),
+            ])
+
+            if use_process_pool:
+                # 初始化共享内存
+                shm_name = f"shm_image_{int(time.time())}_{random.randint(1000, 9999)}"
+                try:
+                    # 创建共享内存
+                    shm = shared_memory.SharedMemory(name=shm_name, create=True, size=img_array.nbytes)
+                    # 创建Numpy数组视图并复制数据
+                    shm_array = np.ndarray(img_array.shape, dtype=img_array.dtype, buffer=shm.buf)
+                    np.copyto(shm_array, img_array)
+                    logger.info(f"已将图像数据复制到共享内存 {shm_name}")
+
+                    # 创建输出帧共享内存环
+                    frame_shape = (self.height, self.width, channels)
+                    for _ in range(max_in_flight + write_queue_size + WRITEV_BATCH_FRAMES + 1):
+                        slot_shm = shared_memory.SharedMemory(create=True, size=int(np.prod(frame_shape)))
+                        frame_ring.append(
+                            (slot_shm, np.ndarray(frame_shape, dtype=np.uint8, buffer=slot_shm.buf))
+                        )
                 
-                # 储存共享内存信息
-                shared_dict = {
-                    'shm_name': shm_name,
-                    'img_shape': img_array.shape,
-                    'dtype': img_array.dtype.name,
-                }
+                    # 储存共享内存信息和渲染参数，工作进程初始化时一次性获取，任务只需传递帧索引
+                    shared_dict = {
+                        'shm_name': shm_name,
+                        'img_shape': img_array.shape,
+                        'dtype': img_array.dtype.name,
+                        'frame_shape': frame_shape,
+                        'frame_slots': [slot_shm.name for slot_shm, _ in frame_ring],
+                        'fill': np.zeros(channels, dtype=np.uint8),
+                        'padding_frames_start': padding_frames_start,
+                        'scroll_frames': scroll_frames,
+                        'scroll_speed': self.scroll_speed,
+                        'max_offset': max_offset,
+                    }
                 
-                # 初始化本进程的共享内存
-                init_shared_memory(shared_dict)
-            except Exception as e:
-                logger.error(f"创建共享内存失败: {str(e)}")
-                shm_name = None
-                shared_dict = None
+                    # 初始化本进程的共享内存
+                    init_shared_memory(shared_dict)
+                except Exception as e:
+                    logger.error(f"创建共享内存失败: {str(e)}")
+                    shm_name = None
+                    shared_dict = None
             
-            logger.info(f"创建{pool_size}个进程的进程池（共享内存：{shm_name or '无'}）")
+                logger.info(f"进程池渲染，{pool_size}个进程（共享内存：{shm_name or '无'}）")
+            else:
+                if transparency_required:
+                    # 透明视频：内核处理越界行并以全透明填充，省去再复制一份补边的RGBA大图
+                    frame_fill = np.zeros(channels, dtype=np.uint8)
+                    warmup_scroll_kernel(channels)
+                    logger.info("透明视频，在主进程中使用Numba内核生成帧")
+                else:
+                    # 底部补一屏背景色行，使任意偏移的切片都不越界，无需边界检查
+                    img_padded = np.empty((img_height + self.height, self.width, channels), dtype=np.uint8)
+                    img_padded[:] = np.array(bg_color[:channels], dtype=np.uint8)
+                    copy_width = min(img_width, self.width)
+                    target = img_padded[:img_height, :copy_width]
+                    if composite_bg is not None:
+                        # 单个uint16整数表达式完成alpha混合，避免float64临时数组（255*255不会溢出uint16）
+                        alpha = img_array[:, :copy_width, 3:4].astype(np.uint16)
+                        np.copyto(
+                            target,
+                            (img_array[:, :copy_width, :3] * alpha + composite_bg * (255 - alpha)) // 255,
+                            casting="unsafe",
+                        )
+                    else:
+                        target[:] = img_array[:, :copy_width]
+                    logger.info("不透明视频，在主进程中直接切片生成帧")
             
             # 记录准备阶段结束，帧处理阶段开始
             preparation_end_time = time.time()
             self.performance_stats["preparation_time"] = preparation_end_time - preparation_start_time
             logger.info(f"准备阶段完成，用时: {self.performance_stats['preparation_time']:.2f}秒")
             
-            # 创建管道和队列
-            read_stdout, write_stdout = os.pipe()
-            read_stderr, write_stderr = os.pipe()
-            stdout_queue = queue.Queue()
-            stderr_queue = queue.Queue()
-            
-            # 获取编码器参数和像素格式
-            codec_params, pix_fmt = self._get_codec_parameters(preferred_codec, transparency_required, 
-                                                              4 if transparency_required else 3)
-                
-            # 构建完整的ffmpeg命令
+            # 长视频：每帧只由帧索引决定，切分为多个分段并行编码后无损拼接；
+            # 只对CPU编码分段（NVENC的并发会话数有限，且硬件编码不随CPU核心数扩展）
+            segment_count = min(MAX_PARALLEL_SEGMENTS, _CPU_COUNT // 2)
+            if (
+                not use_process_pool
+                and total_frames > self.fps * SEGMENT_MIN_DURATION
+                and _CPU_COUNT > 4
+                and "h264_nvenc" not in codec_params
+            ):
+                if img_padded is not None:
+                    def render_frame(frame_idx, out):
+                        offset = frame_offsets[frame_idx]
+                        return img_padded[offset:offset + self.height]
+                else:
+                    # 各分段线程同时生成帧，使用单线程内核（并行内核不能从多个线程并发启动）
+                    def render_frame(frame_idx, out):
+                        return scroll_into_serial(img_array, out, frame_offsets[frame_idx], frame_fill)
+
+                result = self._encode_segments_parallel(
+                    render_frame, total_frames, channels, output_path,
+                    pix_fmt, codec_params, audio_path, segment_count,
+                )
+                if result:
+                    stats = self.performance_stats
+                    stats["total_time"] = time.time() - total_start_time
+                    stats["fps"] = (
+                        stats["frames_processed"] / stats["frame_processing_time"]
+                        if stats["frame_processing_time"] > 0 else 0
+                    )
+                    logger.info(
+                        f"分段并行编码完成，总时间: {stats['total_time']:.2f}秒，"
+                        f"处理 {stats['frames_processed']} 帧，平均 {stats['fps']:.2f}帧/秒"
+                    )
+                    return result
+                logger.warning("分段并行编码失败，回退到单进程编码")
+
+            # 构建完整的ffmpeg命令（复用第2步得到的编码器参数）
             ffmpeg_cmd = self._get_ffmpeg_command(output_path, pix_fmt, codec_params, audio_path)
             
             # 在GPU下记录详细的ffmpeg命令，便于调试
@@ -468,9 +1248,11 @@ class VideoRenderer:
                 if shared_dict is None:
                     shared_dict = {'dummy': True}
                 
-                # 创建进程池（使用spawn确保共享内存兼容性）
-                mp_context = mp.get_context("spawn")
-                with mp_context.Pool(processes=pool_size, initializer=init_worker, initargs=(shared_dict,)) as pool:
+                # 获取复用的进程池（使用spawn确保共享内存兼容性），仅回退路径需要进程池
+                pool_context = contextlib.nullcontext(
+                    self._get_process_pool(pool_size, shared_dict) if use_process_pool else None
+                )
+                with pool_context as pool:
                     
                     # 移除资源限制设置
                     
@@ -479,95 +1261,54 @@ class VideoRenderer:
                     process = subprocess.Popen(
                         ffmpeg_cmd,
                         stdin=subprocess.PIPE,
-                        stdout=subprocess.PIPE,
+                        stdout=subprocess.DEVNULL,  # 输出写入文件，stdout没有内容，无需读取
                         stderr=subprocess.PIPE,
-                        bufsize=10 * 1024 * 1024,  # 大缓冲区
+                        bufsize=0,  # 无缓冲，帧数据直接通过os.write写入管道
                     )
+                    stdin_fd = process.stdin.fileno()
+                    _enlarge_pipe_buffer(stdin_fd)
                     
-                    # 创建stdout和stderr读取线程，防止管道缓冲区满导致FFmpeg阻塞
-                    def read_pipe(pipe, name):
-                        """读取管道数据，防止缓冲区满"""
-                        try:
-                            for line in iter(pipe.readline, b''):
-                                line_str = line.decode('utf-8', errors='replace').strip()
-                                if name == 'stderr' and ('error' in line_str.lower() or 'warning' in line_str.lower()):
-                                    logger.warning(f"FFmpeg {name}: {line_str}")
-                        except Exception as e:
-                            logger.error(f"读取FFmpeg {name}管道时出错: {str(e)}")
-                        finally:
-                            pipe.close()
-                    
-                    # 启动读取线程
-                    stdout_thread = threading.Thread(target=read_pipe, args=(process.stdout, 'stdout'))
-                    stderr_thread = threading.Thread(target=read_pipe, args=(process.stderr, 'stderr'))
-                    stdout_thread.daemon = True
+                    # 创建stderr读取线程，防止管道缓冲区满导致FFmpeg阻塞
+                    stderr_tail = deque(maxlen=20)  # 保留最后几行stderr，FFmpeg失败时输出
+                    stderr_thread = threading.Thread(target=_drain_stderr, args=(process.stderr, stderr_tail))
                     stderr_thread.daemon = True
-                    stdout_thread.start()
                     stderr_thread.start()
                     
                     # 帧处理阶段正式开始（从FFmpeg启动开始计时）
                     frame_processing_start_time = time.time()
 
-                    # 创建帧任务列表
-                    frame_tasks = []
-                    
                     # 记录开始时间（供进度报告使用）
                     processing_start_time = time.time()
-                    
-                    # 前面的静止帧
-                    for i in range(padding_frames_start):
-                        frame_meta = {
-                            'width': self.width,
-                            'height': self.height,
-                            'img_height': img_height,
-                            'scroll_speed': 0,  # 静止不滚动
-                            'fps': self.fps,
-                        }
-                        frame_tasks.append((i, frame_meta))
-                    
-                    # 滚动帧
-                    for i in range(scroll_frames):
-                        # 计算滚动偏移量
-                        frame_idx = padding_frames_start + i
-                        frame_meta = {
-                            'width': self.width,
-                            'height': self.height,
-                            'img_height': img_height,
-                            'scroll_speed': self.scroll_speed,
-                            'fps': self.fps,
-                        }
-                        frame_tasks.append((frame_idx, frame_meta))
-                    
-                    # 后面的静止帧
-                    for i in range(padding_frames_end):
-                        frame_idx = padding_frames_start + scroll_frames + i
-                        frame_meta = {
-                            'width': self.width,
-                            'height': self.height,
-                            'img_height': img_height,
-                            'scroll_speed': 0,  # 静止不滚动
-                            'fps': self.fps,
-                        }
-                        frame_tasks.append((frame_idx, frame_meta))
+
+                    # 首尾静止帧内容完全相同，只渲染一次后重复写入，只有滚动帧交给进程池
+                    top_frame = None
+                    end_frame = None
+                    if use_process_pool:
+                        # 静止帧在主进程中渲染一次（本进程已初始化共享内存）
+                        _, top_frame = _process_frame_optimized_shm(0)
+                        _, end_frame = _process_frame_optimized_shm(padding_frames_start + scroll_frames)
 
                     # 异步处理帧
-                    logger.info(f"开始处理{len(frame_tasks)}帧...")
+                    logger.info(f"开始处理{total_frames}帧...")
                     
                     # 创建进度条
                     pbar = tqdm(
-                        total=len(frame_tasks), 
+                        total=total_frames, 
                         desc=f"渲染视频 ({os.path.basename(output_path)})", 
                         unit="帧",
                         bar_format='{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}{postfix}]',
-                        postfix={"fps": 0.0, "eta": "未知"}
+                        postfix={"fps": 0.0, "eta": "未知"},
+                        mininterval=0.25,
+                        miniters=64,
                     )
                     
                     # 进度报告函数
                     last_report_time = time.time()
                     frames_processed = 0
                     
-                    # 设置看门狗定时器
-                    watchdog_event = threading.Event()
+                    # 看门狗定时器：超过30秒没有进度则终止FFmpeg
+                    watchdog_timeout = 30.0
+                    watchdog = None
                     
                     def report_progress():
                         nonlocal last_report_time, frames_processed, processing_start_time, pbar
@@ -601,131 +1342,209 @@ class VideoRenderer:
                             )
                             last_report_time = current_time
                             
-                            # 重置看门狗
-                            watchdog_event.set()
+                            # 有进度，重新计时看门狗（随进度刷新节流，不逐帧重置）
+                            rearm_watchdog()
                     
-                    # 看门狗线程函数
-                    def watchdog_handler():
-                        """监视进程进度，如果超过30秒没有进展，则终止进程"""
-                        watchdog_timeout = 30.0  # 30秒超时
-                        last_check_frames = 0
-                        last_check_time = time.time()
-                        
-                        # 添加一个信号标志来控制看门狗是否应该继续运行
-                        watchdog_active = True
-                        
-                        while watchdog_active:
-                            # 等待看门狗重置或超时
-                            if watchdog_event.wait(watchdog_timeout / 2):
-                                # 事件被设置，重置看门狗
-                                watchdog_event.clear()
-                                last_check_frames = frames_processed
-                                last_check_time = time.time()
-                                
-                                # 检查是否完成所有帧处理，如果完成则退出看门狗
-                                if frames_processed >= total_frames:
-                                    logger.debug("所有帧已处理完成，看门狗退出")
-                                    watchdog_active = False
+                    def on_stall():
+                        """看门狗到期：超时时间内没有任何进度，终止FFmpeg"""
+                        if frames_processed >= total_frames:
+                            return
+                        logger.error(
+                            f"看门狗检测到处理卡住: {watchdog_timeout}秒内没有进度!"
+                            f"最后处理: {frames_processed}/{total_frames}帧"
+                        )
+                        # 尝试停止处理
+                        try:
+                            process.terminate()
+                        except:
+                            pass
+
+                    def rearm_watchdog():
+                        """取消当前定时器并重新开始计时"""
+                        nonlocal watchdog
+                        if watchdog is not None:
+                            watchdog.cancel()
+                        watchdog = threading.Timer(watchdog_timeout, on_stall)
+                        watchdog.daemon = True
+                        watchdog.start()
+                    
+                    # 启动看门狗
+                    rearm_watchdog()
+
+                    # 5. 流水线处理：进程池乱序计算，主线程按序重排，写入线程负责管道IO
+                    in_flight = threading.Semaphore(max_in_flight)
+                    stop_feeding = threading.Event()
+                    write_queue = queue.Queue(maxsize=write_queue_size)  # 元素为 (帧, 共享内存槽位序号或None)
+                    writer_failed = threading.Event()
+
+                    free_slots = queue.Queue()
+                    for slot in range(len(frame_ring)):
+                        free_slots.put(slot)
+                    slot_of = {}  # 帧索引 -> 分配的槽位序号
+                    # 每个工作进程同时只持有少量任务，保证在途上限内所有进程都有活干
+                    task_chunksize = max(1, max_in_flight // (pool_size * 2))
+
+                    def bounded_tasks():
+                        """按在途上限逐个提交帧索引并分配输出槽位，写出一帧才放行下一帧"""
+                        for frame_idx in range(padding_frames_start, padding_frames_start + scroll_frames):
+                            while not in_flight.acquire(timeout=0.5):
+                                if stop_feeding.is_set():
                                     return
-                            else:
-                                # 检查是否有进展
-                                if frames_processed == last_check_frames:
-                                    current_time = time.time()
-                                    if current_time - last_check_time > watchdog_timeout:
-                                        # 如果已处理了所有帧，不报告卡住
-                                        if frames_processed >= total_frames:
-                                            logger.debug("所有帧已处理完成，看门狗退出")
-                                            return
-                                        
-                                        logger.error(
-                                            f"看门狗检测到处理卡住: {watchdog_timeout}秒内没有进度!"
-                                            f"最后处理: {last_check_frames}/{total_frames}帧"
-                                        )
-                                        # 尝试停止处理
-                                        try:
-                                            process.terminate()
-                                        except:
-                                            pass
-                                        return  # 停止看门狗
+                            while True:
+                                if stop_feeding.is_set():
+                                    return
+                                try:
+                                    slot = free_slots.get(timeout=0.5)
+                                    break
+                                except queue.Empty:
+                                    continue
+                            slot_of[frame_idx] = slot
+                            yield (frame_idx, slot)
+
+                    def pipe_writer():
+                        """写入线程：收集一批按序的帧，通过一次聚集写入交给FFmpeg，不复制帧数据"""
+                        batch = []
+                        batch_slots = []
+                        batch_bytes = 0
+
+                        def flush_batch():
+                            nonlocal batch_bytes
+                            # 出错后只丢弃数据，继续消费队列避免主线程阻塞
+                            if batch and not writer_failed.is_set():
+                                try:
+                                    _writev_to_pipe(stdin_fd, batch)
+                                except BrokenPipeError:
+                                    logger.warning("FFmpeg管道已关闭，停止写入帧")
+                                    writer_failed.set()
+                                except Exception as e:
+                                    logger.error(f"写入帧数据时出错: {str(e)}")
+                                    writer_failed.set()
+                            # 帧数据已写出，归还共享内存槽位
+                            for slot in batch_slots:
+                                free_slots.put(slot)
+                            batch.clear()
+                            batch_slots.clear()
+                            batch_bytes = 0
+
+                        while True:
+                            item = write_queue.get()
+                            if item is None:
+                                break
+                            frame, slot = item
+                            batch.append(frame)
+                            batch_bytes += frame.nbytes
+                            if slot is not None:
+                                batch_slots.append(slot)
+                            # 攒满一批或生产端暂时没有新帧时立即写出，避免FFmpeg等待
+                            if (len(batch) >= WRITEV_BATCH_FRAMES
+                                    or batch_bytes >= PIPE_WRITE_BATCH_BYTES
+                                    or write_queue.empty()):
+                                flush_batch()
+                        # 写出剩余帧
+                        flush_batch()
+
+                    writer_thread = threading.Thread(target=pipe_writer, name="ffmpeg-writer")
+                    writer_thread.daemon = True
+                    writer_thread.start()
+
+                    pending = {}  # 乱序到达、尚未写出的帧
+                    next_to_write = 0
+                    try:
+                        if not use_process_pool:
+                            # 透明视频的输出帧轮换使用：未写出的帧最多为写入队列中的帧加写入线程持有的一批，
+                            # 环形缓冲再多留余量即可保证复用时该帧已被写出
+                            out_frames = []
+                            if img_padded is None:
+                                out_frames = self._init_output_buffers(
+                                    channels, write_queue.maxsize + WRITEV_BATCH_FRAMES + 2
+                                )
+
+                            # 单生产者：不透明视频直接切出连续视图（零拷贝），透明视频由内核写入轮换帧
+                            for n, offset in enumerate(frame_offsets):
+                                if writer_failed.is_set() or process.poll() is not None:
+                                    logger.error(f"FFmpeg进程意外退出，返回码: {process.poll()}")
+                                    break
+                                if img_padded is not None:
+                                    frame = img_padded[offset:offset + self.height]
                                 else:
-                                    # 有进展，重置
-                                    last_check_frames = frames_processed
-                                    last_check_time = time.time()
-                    
-                    # 启动看门狗线程
-                    watchdog = threading.Thread(target=watchdog_handler)
-                    watchdog.daemon = True
-                    watchdog.start()
-                    
-                    # 初始化看门狗
-                    watchdog_event.set()
-
-                    # 5. 分批处理并流式输出到FFMPEG
-                    chunk_size = 12  # 每批处理帧数
-                    total_batches = (len(frame_tasks) + chunk_size - 1) // chunk_size
-
-                    for batch_idx in range(total_batches):
-                        # 获取当前批次任务
-                        start_idx = batch_idx * chunk_size
-                        end_idx = min(start_idx + chunk_size, len(frame_tasks))
-                        current_batch = frame_tasks[start_idx:end_idx]
-                        
-                        try:
-                            # 并行处理当前批次
-                            results = pool.map(_process_frame_optimized_shm, current_batch)
-                            
-                            # 按顺序写入FFmpeg
-                            for result in results:
-                                if result is not None:
-                                    frame_idx, frame = result
-                                    
-                                    # 检查FFmpeg是否仍在运行，如果退出则不再写入
-                                    if process.poll() is not None:
-                                        logger.warning(f"FFmpeg进程已退出(返回码:{process.returncode})，停止写入帧")
-                                        break
-                                    
-                                    try:
-                                        # 优化: 直接写入二进制数据，避免额外复制
-                                        frame_bytes = frame.tobytes()
-                                        process.stdin.write(frame_bytes)
-                                        process.stdin.flush()
-                                        
-                                        # 更新进度
-                                        frames_processed += 1
-                                        
-                                        # 更新进度条
-                                        pbar.update(1)
-                                        
-                                        # 报告进度
+                                    frame = scroll_into(img_array, out_frames[n % len(out_frames)], offset, frame_fill)
+                                write_queue.put((frame, None))
+                                frames_processed += 1
+                                # 每64帧采样一次进度，避免逐帧刷新终端
+                                if frames_processed & 63 == 0:
+                                    report_progress()
+                        else:
+                            def write_static_frames(frame, count):
+                                """重复写入同一静止帧"""
+                                nonlocal frames_processed
+                                if frame is None:
+                                    logger.warning(f"静止帧渲染失败，跳过{count}帧")
+                                    return
+                                for _ in range(count):
+                                    write_queue.put((frame, None))
+                                    frames_processed += 1
+                                    if frames_processed & 63 == 0:
                                         report_progress()
-                                    except BrokenPipeError:
-                                        logger.warning("FFmpeg管道已关闭，停止写入帧")
-                                        break
-                                    except Exception as e:
-                                        logger.error(f"写入帧数据时出错: {str(e)}")
-                                        break
-                        except Exception as e:
-                            logger.error(f"处理批次 {batch_idx+1}/{total_batches} 时出错: {str(e)}\n{traceback.format_exc()}")
-                            # 继续尝试处理其他批次
-                        
-                        # 检查FFmpeg是否仍在运行
-                        if process.poll() is not None:
-                            logger.error(f"FFmpeg进程意外退出，返回码: {process.returncode}")
-                            # 读取剩余错误输出
+
+                            write_static_frames(top_frame, padding_frames_start)
+                            next_to_write = padding_frames_start
+
+                            for frame_idx, done_slot in pool.imap_unordered(
+                                _process_frame_optimized_shm, bounded_tasks(), chunksize=task_chunksize
+                            ):
+                                pending[frame_idx] = done_slot
+
+                                # 按帧序写出所有已就绪的帧
+                                while next_to_write in pending:
+                                    done_slot = pending.pop(next_to_write)
+                                    slot = slot_of.pop(next_to_write)
+                                    next_to_write += 1
+                                    in_flight.release()
+                                    if done_slot is None:
+                                        logger.warning(f"帧 {next_to_write - 1} 处理失败，已跳过")
+                                        free_slots.put(slot)
+                                        continue
+                                    write_queue.put((frame_ring[slot][1], slot))
+
+                                    # 更新进度，每64帧采样报告一次
+                                    frames_processed += 1
+                                    if frames_processed & 63 == 0:
+                                        report_progress()
+
+                                # 检查FFmpeg是否仍在运行，如果退出则不再写入
+                                if writer_failed.is_set() or process.poll() is not None:
+                                    logger.error(f"FFmpeg进程意外退出，返回码: {process.poll()}")
+                                    break
+                            else:
+                                write_static_frames(end_frame, padding_frames_end)
+                    except Exception as e:
+                        logger.error(f"处理帧时出错: {str(e)}\n{traceback.format_exc()}")
+                    finally:
+                        stop_feeding.set()
+                        write_queue.put(None)
+                        writer_thread.join()
+
+                        # 释放输出帧共享内存环（先丢弃帧视图，否则无法关闭共享内存）
+                        ring_shms = [slot_shm for slot_shm, _ in frame_ring]
+                        frame_ring.clear()
+                        for slot_shm in ring_shms:
                             try:
-                                while True:
-                                    err_line = stderr_queue.get_nowait()
-                                    if err_line is None:
-                                        break
-                                    logger.error(f"FFmpeg错误: {err_line.decode('utf-8', errors='replace').strip()}")
-                            except queue.Empty:
-                                pass
-                            break
+                                slot_shm.close()
+                                slot_shm.unlink()
+                            except Exception as e:
+                                logger.debug(f"释放输出帧共享内存失败: {e}")
+
+                        # 删除源图像共享内存（复用的工作进程在下次渲染重新绑定时断开映射）
+                        if shm is not None:
+                            try:
+                                shm.unlink()
+                            except Exception as e:
+                                logger.debug(f"删除源图像共享内存失败: {e}")
 
                     # 6. 完成处理，关闭stdin管道
-                    # 设置信号通知看门狗线程所有帧处理完成
-                    watchdog_event.set()
-                    logger.debug(f"所有{frames_processed}帧处理完成，通知看门狗线程退出")
+                    # 所有帧处理完成，停止看门狗
+                    watchdog.cancel()
+                    logger.debug(f"所有{frames_processed}帧处理完成，已停止看门狗")
                     
                     # 安全关闭stdin管道
                     try:
@@ -749,50 +1568,26 @@ class VideoRenderer:
                     
                     # 添加超时机制，防止无限等待
                     encoding_timeout = 120  # 编码超时时间，单位：秒，对于GPU加速任务设置更长时间
-                    encoding_wait_interval = 0.5  # 检查间隔，单位：秒
-                    wait_start_time = time.time()
                     encoding_progress_interval = 5.0  # 日志报告间隔，单位：秒
-                    last_progress_time = time.time()
+                    deadline = time.time() + encoding_timeout
                     
-                    # 等待FFmpeg完成，但设置超时
+                    # 阻塞等待FFmpeg退出（进程退出时立即唤醒），每个报告间隔醒来一次报告进度并检查超时
                     return_code = None
-                    while process.poll() is None:
+                    while not _wait_for_exit(process, min(encoding_progress_interval, deadline - time.time())):
                         current_time = time.time()
                         
-                        # 检查是否应该报告进度
-                        if current_time - last_progress_time >= encoding_progress_interval:
-                            encoding_elapsed = current_time - encoding_start_time
-                            logger.info(f"FFmpeg编码进行中，已等待 {encoding_elapsed:.1f} 秒...")
-                            last_progress_time = current_time
-                        
                         # 检查是否超时
-                        current_wait_time = current_time - wait_start_time
-                        if current_wait_time > encoding_timeout:
+                        if current_time >= deadline:
                             logger.warning(f"FFmpeg编码阶段已等待{encoding_timeout}秒，超时强制结束")
-                            try:
-                                process.terminate()
-                                # 给进程一点时间来终止
-                                time.sleep(1)
-                                # 如果仍在运行，强制结束
-                                if process.poll() is None:
-                                    logger.warning("FFmpeg进程未响应terminate()，尝试强制终止(kill)")
-                                    process.kill()
-                                    time.sleep(0.5)
-                                    
-                                # 最后检查
-                                if process.poll() is None:
-                                    logger.error("无法终止FFmpeg进程，可能需要手动清理")
-                                else:
-                                    logger.warning(f"FFmpeg进程已终止，返回码: {process.returncode}")
-                            except Exception as e:
-                                logger.error(f"终止FFmpeg进程时出错: {e}")
+                            _stop_process(process)
+                            logger.warning(f"FFmpeg进程已终止，返回码: {process.returncode}")
                             
                             # 设置错误返回码
                             return_code = -9  # 自定义超时错误码
                             break
                         
-                        # 短暂等待后再次检查
-                        time.sleep(encoding_wait_interval)
+                        encoding_elapsed = current_time - encoding_start_time
+                        logger.info(f"FFmpeg编码进行中，已等待 {encoding_elapsed:.1f} 秒...")
                     
                     # 记录编码结束状态
                     encoding_time = time.time() - encoding_start_time
@@ -816,74 +1611,43 @@ class VideoRenderer:
                     self.performance_stats["total_time"] = total_end_time - total_start_time
                     self.performance_stats["fps"] = frames_processed / self.performance_stats["frame_processing_time"] if self.performance_stats["frame_processing_time"] > 0 else 0
                     
-                    # 关闭进度条
+                    # 同步最终进度并关闭进度条
+                    pbar.n = frames_processed
                     pbar.close()
                     
-                    # 确保看门狗线程退出
-                    if 'watchdog' in locals():
-                        try:
-                            # 最后一次设置信号
-                            watchdog_event.set()
-                            # 等待看门狗线程结束，但最多等待2秒
-                            watchdog.join(timeout=2)
-                        except Exception as e:
-                            logger.debug(f"等待看门狗线程时出错: {e}")
-                    
-                    # 等待输出线程完成
-                    if 'stdout_thread' in locals() and stdout_thread.is_alive():
-                        try:
-                            stdout_thread.join(timeout=2)
-                        except Exception as e:
-                            logger.debug(f"等待stdout线程时出错: {e}")
-                    
-                    if 'stderr_thread' in locals() and stderr_thread.is_alive():
-                        try:
-                            stderr_thread.join(timeout=2)
-                        except Exception as e:
-                            logger.debug(f"等待stderr线程时出错: {e}")
-                    
-                    # 读取剩余输出
-                    while True:
-                        try:
-                            err_line = stderr_queue.get_nowait()
-                            if err_line is None:
-                                break
-                            # 只记录错误和警告
-                            err_str = err_line.decode('utf-8', errors='replace').strip()
-                            if "error" in err_str.lower() or "warning" in err_str.lower():
-                                logger.warning(f"FFmpeg: {err_str}")
-                        except queue.Empty:
-                            break
-
-                    # 删除对不存在线程的引用
-                    # stdout_thread.join(timeout=2)
-                    # stderr_thread.join(timeout=2)
+                    # 等待stderr读取线程读完剩余输出
+                    stderr_thread.join(timeout=2)
                     
                     # 检查退出状态
                     if return_code != 0:
                         logger.error(f"FFmpeg进程异常退出，代码: {return_code}")
+                        if stderr_tail:
+                            logger.error(f"FFmpeg最后输出:\n{_format_tail(stderr_tail)}")
                         return None
-                    else:
-                        # 输出详细的性能统计报告
-                        logger.info("=" * 50)
-                        logger.info("视频渲染性能报告:")
-                        logger.info(f"1. 准备阶段: {self.performance_stats['preparation_time']:.2f}秒 ({self.performance_stats['preparation_time'] / self.performance_stats['total_time'] * 100:.1f}%)")
-                        logger.info(f"2. 帧处理阶段: {self.performance_stats['frame_processing_time']:.2f}秒 ({self.performance_stats['frame_processing_time'] / self.performance_stats['total_time'] * 100:.1f}%) - {self.performance_stats['fps']:.2f}帧/秒")
-                        logger.info(f"3. 视频编码阶段: {self.performance_stats['encoding_time']:.2f}秒 ({self.performance_stats['encoding_time'] / self.performance_stats['total_time'] * 100:.1f}%)")
-                        logger.info(f"总时间: {self.performance_stats['total_time']:.2f}秒，处理 {frames_processed} 帧")
-                        logger.info("=" * 50)
+                    elif logger.isEnabledFor(logging.INFO):
+                        # 输出详细的性能统计报告（总时间过小时不计算有意义的占比，避免除零）
+                        stats = self.performance_stats
+                        total_time = stats["total_time"]
+                        denom = total_time if total_time > 1e-6 else 1.0
+                        logger.info(
+                            _RENDER_REPORT_TEMPLATE,
+                            stats["preparation_time"], stats["preparation_time"] / denom * 100,
+                            stats["frame_processing_time"], stats["frame_processing_time"] / denom * 100, stats["fps"],
+                            stats["encoding_time"], stats["encoding_time"] / denom * 100,
+                            total_time, frames_processed,
+                        )
                 
             except Exception as e:
                 logger.error(f"处理视频时出错: {str(e)}\n{traceback.format_exc()}")
+                # 停止看门狗，避免异常退出后定时器误报
+                if 'watchdog' in locals() and watchdog is not None:
+                    watchdog.cancel()
+                # 进程池中可能残留本次渲染的任务，不再复用
+                if use_process_pool:
+                    self.close()
                 # 如果仍有FFmpeg进程，尝试终止
-                try:
-                    if 'process' in locals() and process.poll() is None:
-                        process.terminate()
-                        time.sleep(0.5)
-                        if process.poll() is None:
-                            process.kill()
-                except:
-                    pass
+                if 'process' in locals():
+                    _stop_process(process)
 
                 # 检查是否为参数错误，提供具体诊断
                 error_str = str(e).lower()
@@ -937,6 +1701,7 @@ class VideoRenderer:
         preferred_codec="h264_nvenc",
         audio_path=None,
         bg_color=(0, 0, 0, 255),
+        force_raw_pipe=False,
     ):
         """
         创建滚动视频
@@ -949,6 +1714,7 @@ class VideoRenderer:
             preferred_codec: 首选视频编码器，默认尝试GPU加速
             audio_path: 可选的音频文件路径
             bg_color: 背景颜色，用于非透明视频
+            force_raw_pipe: 不透明视频也强制在Python中生成帧并通过管道传给FFmpeg
 
         Returns:
             输出视频的路径
@@ -986,6 +1752,28 @@ class VideoRenderer:
             f"总帧数: {total_frames} (开始静止: {start_static_time}秒, 滚动: {scroll_frames/self.fps:.2f}秒, 结束静止: {end_static_time}秒)"
         )
 
+        # 不透明视频：图像能覆盖整个画面时，由FFmpeg读取一次源图像并用crop滤镜按时间滚动，
+        # 无需在Python中生成帧再通过管道传输原始像素；滚动节奏与下面的管道路径一致
+        if (
+            not transparency_required
+            and not force_raw_pipe
+            and img_width >= self.width
+            and img_height > self.height
+        ):
+            logger.info("不透明视频使用FFmpeg crop滤镜滚动源图像")
+            return self.create_scrolling_video_ffmpeg(
+                image,
+                os.path.splitext(output_path)[0] + ".mp4",
+                text_actual_height,
+                transparency_required=False,
+                preferred_codec=preferred_codec,
+                audio_path=audio_path,
+                bg_color=bg_color,
+                start_static_time=start_static_time,
+                end_static_time=end_static_time,
+                min_scroll_duration=0,
+            )
+
         # 确定像素格式和编码器
         if transparency_required:
             # 透明视频使用ProRes 4444
@@ -1012,8 +1800,7 @@ class VideoRenderer:
             output_path = os.path.splitext(output_path)[0] + ".mp4"
 
             # 检查操作系统，在macOS上默认使用CPU编码
-            is_macos = platform.system() == "Darwin"
-            if is_macos:
+            if _IS_MACOS:
                 # macOS上强制使用CPU编码
                 logger.info("检测到macOS系统，将使用CPU编码器")
                 os.environ["NO_GPU"] = "1"
@@ -1026,7 +1813,9 @@ class VideoRenderer:
                     "-c:v",
                     preferred_codec,
                     "-preset",
-                    "p4",  # 提升到p4预设（更高性能）
+                    _NVENC_PRESETS.get(self.encoder_preset, "p4"),
+                    "-tune",
+                    "ll",
                     "-b:v",
                     "8M",  # 提升到8M比特率
                     "-pix_fmt",
@@ -1034,7 +1823,7 @@ class VideoRenderer:
                     "-movflags",
                     "+faststart",
                 ]
-                logger.info(f"使用GPU编码器: {preferred_codec}，预设:p4，比特率:8M")
+                logger.info(f"使用GPU编码器: {preferred_codec}，预设:{_NVENC_PRESETS.get(self.encoder_preset, 'p4')}，比特率:8M")
                 use_gpu = True
             else:
                 # 回退到CPU编码，但使用更高性能设置
@@ -1042,9 +1831,9 @@ class VideoRenderer:
                     "-c:v",
                     "libx264",
                     "-crf",
-                    "20",
+                    str(self.crf),
                     "-preset",
-                    "medium",
+                    self.encoder_preset,
                     "-pix_fmt",
                     "yuv420p",
                     "-movflags",
@@ -1055,66 +1844,60 @@ class VideoRenderer:
                 logger.info(f"使用CPU编码器: libx264 (GPU编码器不可用或被禁用)")
                 use_gpu = False
 
-        # 预分配大型数组，减少内存碎片
-        try:
-            # 预热内存，减少动态分配开销
-            if not transparency_required:
-                # 为RGB预分配
-                batch_size = 240 if not use_gpu else 120  # 增大批处理大小
-                warmup_buffer = np.zeros(
-                    (batch_size, self.height, self.width, 3), dtype=np.uint8
-                )
-                del warmup_buffer
-            else:
-                # 为RGBA预分配
-                batch_size = 120  # 透明视频使用较小的批处理大小
-                warmup_buffer = np.zeros(
-                    (batch_size, self.height, self.width, 4), dtype=np.uint8
-                )
-                del warmup_buffer
-
-            # 强制垃圾回收
-            gc.collect()
-            logger.info("内存预热完成")
-        except Exception as e:
-            logger.warning(f"内存预热失败: {e}")
-            batch_size = 60  # 回退到较小的批处理大小
-
-        # 数据传输模式：直接模式或缓存模式
-        # 根据GPU/CPU模式调整批处理大小
-        if not "batch_size" in locals():
-            batch_size = 60  # 降低批处理大小
+        # 根据视频类型和GPU/CPU模式确定批处理大小；
+        # 帧直接取自补边图像切片或帧环槽位，无需预热内存
+        if not transparency_required:
+            batch_size = 240 if not use_gpu else 120
+        else:
+            batch_size = 120  # 透明视频使用较小的批处理大小
         num_batches = (total_frames + batch_size - 1) // batch_size
 
         # 确定最佳进程数
         try:
-            cpu_count = mp.cpu_count()
             # 减少使用的核心数，为系统和ffmpeg留下更多资源
-            optimal_processes = min(8, max(2, cpu_count - 1))
+            optimal_processes = min(8, max(2, _CPU_COUNT - 1))
             num_processes = optimal_processes
             logger.info(
-                f"检测到{cpu_count}个CPU核心，优化使用{num_processes}个进程进行渲染，批处理大小:{batch_size}"
+                f"检测到{_CPU_COUNT}个CPU核心，优化使用{num_processes}个进程进行渲染，批处理大小:{batch_size}"
             )
         except:
             num_processes = 6  # 默认使用较少进程
             logger.info(f"使用默认{num_processes}个进程，批处理大小:{batch_size}")
 
-        # 初始化内存池 - 减小池大小以降低内存压力
-        channels = 4 if transparency_required else 3
-        self._init_memory_pool(channels, pool_size=720)  # 增加内存池大小提高性能
-
         # 将图像转换为numpy数组
         img_array = np.array(image)
 
+        # 一次性计算每帧对应的图像起始行：开始静止阶段停在顶部，滚动阶段按速度递增，结束静止阶段停在底部
+        start_frames = start_static_time * self.fps
+        end_frames = end_static_time * self.fps
+        end_y = max(0, img_height - self.height)
+        frame_ids = np.arange(total_frames)
+        start_rows = np.where(
+            frame_ids >= total_frames - end_frames,
+            end_y,
+            np.clip(((frame_ids - start_frames) * self.scroll_speed).astype(np.int64), 0, end_y),
+        )
+
+        # 背景色只转换一次，帧参数中直接传递该数组
+        frame_bg = np.array(bg_color[:3], dtype=np.uint8)
+
+        # 不透明视频在主进程中直接切片：底部补足背景色行，使每帧都是完整的连续切片
+        img_padded = None
+        if not transparency_required:
+            img_padded = np.empty((max(img_height, self.height), self.width, 3), dtype=np.uint8)
+            img_padded[:] = frame_bg
+            copy_width = min(img_width, self.width)
+            img_padded[:img_height, :copy_width] = img_array[:, :copy_width, :3]
+
         # 完整的ffmpeg命令
         ffmpeg_cmd = [
             "ffmpeg",
             "-y",
-            # I/O优化参数
+            # I/O优化参数（rawvideo的格式由命令行完全指定，无需探测）
             "-probesize",
-            "32M",  # 增加探测缓冲区大小
+            "32",
             "-analyzeduration",
-            "32M",  # 增加分析时间
+            "0",
             "-thread_queue_size",
             "4096",  # 大幅增加线程队列大小
             # 输入格式参数
@@ -1133,14 +1916,15 @@ class VideoRenderer:
         ]
 
         # 添加音频输入（如果有）
-        if audio_path and os.path.exists(audio_path):
+        has_audio = bool(audio_path and os.path.exists(audio_path))
+        if has_audio:
             ffmpeg_cmd.extend(["-i", audio_path])
 
         # 添加视频编码参数
         ffmpeg_cmd.extend(video_codec_params)
 
         # 添加音频映射（如果有）
-        if audio_path and os.path.exists(audio_path):
+        if has_audio:
             ffmpeg_cmd.extend(
                 [
                     "-c:a",
@@ -1162,54 +1946,116 @@ class VideoRenderer:
 
         logger.info(f"FFmpeg命令: {' '.join(ffmpeg_cmd)}")
 
+        # 设置主进程中帧处理函数使用的全局图像数组
+        frame_processors._g_img_array = img_array
+        pool_context = contextlib.nullcontext()
+        writer_queue = queue.Queue(maxsize=4)
+        writer_batch_frames = 32
+        img_shm = None
+        ring_shm = None
+        free_slots = queue.Queue()
+        ring = None
+        if transparency_required and NUMBA_AVAILABLE:
+            # 透明视频且Numba可用：主进程中每次调用批量滚动内核渲染一批帧到帧环，
+            # 无需进程池和共享内存；槽位由写入线程写出后归还
+            ring = np.empty(
+                (writer_batch_frames * (writer_queue.maxsize + 2), self.height, self.width, 4),
+                dtype=np.uint8,
+            )
+            for slot in range(ring.shape[0]):
+                free_slots.put(slot)
+            warmup_scroll_kernel(4)
+            logger.info("透明帧使用Numba批量滚动内核渲染")
+        elif transparency_required:
+            # 透明视频：工作进程把帧直接渲染到共享内存帧环的槽位中，只回传槽位序号，
+            # 帧数据不经进程池管道回传；槽位由写入线程写出后归还。
+            # 槽位数覆盖写入队列、写入线程和主线程各持有的一批帧，以及每个工作进程的在途任务
+            ring_size = writer_batch_frames * (writer_queue.maxsize + 2) + num_processes * 2
+            ring_shape = (ring_size, self.height, self.width, 4)
+            ring_shm = shared_memory.SharedMemory(create=True, size=int(np.prod(ring_shape)))
+            frame_processors._g_frame_ring = np.ndarray(ring_shape, dtype=np.uint8, buffer=ring_shm.buf)
+            for slot in range(ring_size):
+                free_slots.put(slot)
+
+            # 源图像放入共享内存，复用的工作进程按名称连接，无需每次渲染重新创建进程池
+            img_shm = shared_memory.SharedMemory(create=True, size=img_array.nbytes)
+            np.ndarray(img_array.shape, dtype=np.uint8, buffer=img_shm.buf)[:] = img_array
+            shared_dict = {
+                'shm_name': img_shm.name,
+                'img_shape': img_array.shape,
+                'dtype': img_array.dtype.name,
+                'ring_name': ring_shm.name,
+                'ring_shape': ring_shape,
+            }
+            pool_context = contextlib.nullcontext(self._get_process_pool(num_processes, shared_dict))
+
         # 启动FFmpeg进程
         process = subprocess.Popen(
             ffmpeg_cmd,
             stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
             stderr=subprocess.PIPE,
-            bufsize=10**8,  # 增大缓冲区
+            bufsize=0,  # 无缓冲，避免在管道之上再多一层Python缓冲区复制
         )
+        stdin_fd = process.stdin.fileno()
+        _enlarge_pipe_buffer(stdin_fd)
+
+        # stderr读取线程：整块读取并只保留最后几行，防止管道写满后FFmpeg阻塞
+        stderr_tail = deque(maxlen=20)
+        stderr_thread = threading.Thread(target=_drain_stderr, args=(process.stderr, stderr_tail))
+        stderr_thread.daemon = True
+        stderr_thread.start()
 
         # 创建进度条
-        pbar = tqdm(total=total_frames, desc="渲染进度")
+        # 每批更新一次进度，并由tqdm自身限制刷新频率
+        pbar = tqdm(total=total_frames, desc="渲染进度", mininterval=0.2, miniters=batch_size)
+
+        # 写入线程：计算帧与管道写入重叠，每批帧一次writev系统调用
+        writer_failed = threading.Event()
+        writer_thread = threading.Thread(
+            target=_pipe_writer_loop,
+            args=(writer_queue, stdin_fd, writer_failed, free_slots),
+            name="ffmpeg-writer",
+        )
+        writer_thread.daemon = True
+        writer_thread.start()
 
-        # 创建多进程池
-        with mp.Pool(processes=num_processes) as pool:
-            # 设置全局图像数组
-            global _g_img_array
-            _g_img_array = img_array
+        # 使用多进程池
+        with pool_context as pool:
 
             # 帧计数器
             self.frame_counter = 0
             start_time = time.time()
 
+            # 帧循环期间暂停循环垃圾回收：帧都是ndarray视图和元组，
+            # 不会形成引用环，分代回收只会在批次之间带来无谓的停顿
+            gc_was_enabled = gc.isenabled()
+            gc.disable()
+
             try:
                 # 处理每个批次
                 for batch_idx in range(num_batches):
                     batch_start = batch_idx * batch_size
                     batch_end = min(batch_start + batch_size, total_frames)
-                    batch_frames = []
-
-                    # 准备批次帧参数
-                    for frame_idx in range(batch_start, batch_end):
-                        # 计算当前帧对应的图像Y坐标
-                        if frame_idx < start_static_time * self.fps:
-                            # 开始静止阶段
-                            img_start_y = 0
-                        elif frame_idx >= total_frames - end_static_time * self.fps:
-                            # 结束静止阶段
-                            img_start_y = max(0, img_height - self.height)
-                        else:
-                            # 滚动阶段
-                            scroll_frame_idx = frame_idx - start_static_time * self.fps
-                            img_start_y = min(
-                                img_height - self.height,
-                                int(scroll_frame_idx * self.scroll_speed),
-                            )
 
-                        # 添加到批次
-                        batch_frames.append(
+                    ys = start_rows[batch_start:batch_end].tolist()
+
+                    if img_padded is not None:
+                        # 不透明视频：每帧都是补边图像的连续切片（零拷贝），无需进程池
+                        frames = iter([(img_padded[y:y + self.height], None) for y in ys])
+                    elif ring is not None:
+                        # 透明视频：每次内核调用渲染一个写入批次的帧
+                        frames = _render_into_ring(
+                            img_array,
+                            ring,
+                            start_rows[batch_start:batch_end],
+                            free_slots,
+                            _TRANSPARENT_FILL,
+                            writer_batch_frames,
+                        )
+                    else:
+                        # 准备批次帧参数
+                        batch_frames = [
                             (
                                 frame_idx,
                                 img_start_y,
@@ -1218,46 +2064,53 @@ class VideoRenderer:
                                 self.height,
                                 self.width,
                                 transparency_required,
-                                bg_color[:3],  # 只传递RGB部分
+                                frame_bg,  # 只传递RGB部分
                             )
-                        )
-
-                    # 处理当前批次
-                    if len(batch_frames) > 60 and num_processes > 1:
-                        # 大批处理：并行处理所有帧
-                        pool_results = pool.map(_process_frame_optimized, batch_frames)
-                        processed_frames = sorted(pool_results, key=lambda x: x[0])
-                    else:
-                        # 小批处理：使用fast_frame_processor直接处理
-                        try:
-                            frames_processed = fast_frame_processor(
-                                batch_frames, self.memory_pool, process
+                            for frame_idx, img_start_y in enumerate(ys, batch_start)
+                        ]
+
+                        # 处理当前批次
+                        if len(batch_frames) > 60 and num_processes > 1:
+                            # 大批处理：imap按提交顺序逐个返回槽位，帧一就绪即可交给写入线程；
+                            # 任务生成器在取不到空闲槽位时等待写入线程归还
+                            ring = frame_processors._g_frame_ring
+                            processed_slots = pool.imap(
+                                _process_frame_into_slot,
+                                ((params, free_slots.get()) for params in batch_frames),
+                                chunksize=max(1, len(batch_frames) // (num_processes * 4)),
                             )
-                            self.frame_counter += frames_processed
-                            pbar.update(frames_processed)
-                            continue  # 跳过后续处理，因为帧已经直接写入
-                        except Exception as e:
-                            logger.error(f"快速帧处理器失败: {e}，回退到标准处理")
-                            # 回退到标准处理
-                            processed_frames = []
-                            for params in batch_frames:
-                                frame_idx, frame = _process_frame_optimized(params)
-                                processed_frames.append((frame_idx, frame))
-
-                    # 将处理后的帧写入FFmpeg
-                    for _, frame in processed_frames:
-                        process.stdin.write(frame.tobytes())
-                        self.frame_counter += 1
-                        pbar.update(1)
-
-                # 关闭stdin，等待FFmpeg完成
+                            frames = ((ring[slot], slot) for _, slot in processed_slots)
+                        else:
+                            # 小批处理：在主进程中直接处理（每帧都是新数组，可安全交给写入线程）
+                            frames = ((frame, None) for _, frame in map(_process_frame_optimized, batch_frames))
+
+                    # 按批交给写入线程，帧数据不再经过tobytes()复制
+                    while True:
+                        chunk = list(islice(frames, writer_batch_frames))
+                        if not chunk:
+                            break
+                        if writer_failed.is_set():
+                            raise Exception("写入FFmpeg管道失败")
+                        writer_queue.put((
+                            [frame for frame, _ in chunk],
+                            [slot for _, slot in chunk if slot is not None],
+                        ))
+                        self.frame_counter += len(chunk)
+
+                    pbar.update(batch_end - batch_start)
+
+                # 等待写入线程写完剩余帧，再关闭stdin，等待FFmpeg完成
+                writer_queue.put(None)
+                writer_thread.join()
+                if writer_failed.is_set():
+                    raise Exception("写入FFmpeg管道失败")
                 process.stdin.close()
                 process.wait()
+                stderr_thread.join(timeout=2)
 
                 # 检查FFmpeg是否成功
                 if process.returncode != 0:
-                    stderr = process.stderr.read().decode("utf-8", errors="ignore")
-                    logger.error(f"FFmpeg错误: {stderr}")
+                    logger.error(f"FFmpeg错误: {_format_tail(stderr_tail)}")
                     raise Exception(f"FFmpeg处理失败，返回码: {process.returncode}")
 
                 # 计算性能统计
@@ -1272,21 +2125,41 @@ class VideoRenderer:
 
             except Exception as e:
                 logger.error(f"视频渲染失败: {str(e)}", exc_info=True)
-                # 尝试终止FFmpeg进程
-                try:
-                    process.terminate()
-                except:
-                    pass
+                # 进程池中可能残留本次渲染的任务，不再复用
+                if transparency_required and ring is None:
+                    self.close()
                 raise e
 
             finally:
+                # 异常或中断时终止FFmpeg（正常结束时已退出），阻塞在写入上的写入线程随之返回
+                _stop_process(process)
+
+                # 停止写入线程（正常结束时已退出）
+                if writer_thread.is_alive():
+                    writer_failed.set()
+                    writer_queue.put(None)
+                    writer_thread.join(timeout=5)
+
                 # 关闭进度条
                 if 'pbar' in locals():
                     pbar.close()
                     
                 # 清理
-                _g_img_array = None
-                gc.collect()  # 强制垃圾回收
+                frame_processors._g_img_array = None
+                frame_processors._g_frame_ring = None
+                for shm in (ring_shm, img_shm):
+                    if shm is None:
+                        continue
+                    shm.unlink()
+                    try:
+                        shm.close()
+                    except BufferError:
+                        # 仍有帧视图引用该内存，映射随视图回收时释放
+                        pass
+                # 渲染结束后恢复垃圾回收，并统一回收一次
+                if gc_was_enabled:
+                    gc.enable()
+                gc.collect()
 
             return output_path
 
@@ -1321,6 +2194,9 @@ class VideoRenderer:
         preferred_codec="libx264",
         audio_path=None,
         bg_color=(255, 255, 255),
+        start_static_time=2.0,
+        end_static_time=2.0,
+        min_scroll_duration=8.0,
     ):
         """
         使用FFmpeg的crop滤镜和时间表达式创建滚动视频
@@ -1333,13 +2209,16 @@ class VideoRenderer:
             preferred_codec: 首选视频编码器
             audio_path: 可选的音频文件路径
             bg_color: 背景颜色 (R,G,B) 或 (R,G,B,A)
+            start_static_time: 开始静止时间（秒）
+            end_static_time: 结束静止时间（秒）
+            min_scroll_duration: 最短滚动时间（秒）
         
         Returns:
             输出视频的路径
         """
         try:
             # 记录开始时间
-            total_start_time = time.time()
+            total_start_time = time.monotonic()  # 耗时统计使用单调时钟，不受系统时间调整影响
             
             # 初始化性能统计
             self.performance_stats = {
@@ -1351,7 +2230,7 @@ class VideoRenderer:
             }
             
             # 1. 准备图像
-            preparation_start_time = time.time()
+            preparation_start_time = time.monotonic()
             
             # 将输入图像转换为PIL.Image对象
             if isinstance(image, np.ndarray):
@@ -1369,17 +2248,12 @@ class VideoRenderer:
             # 确保输出目录存在
             os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
             
-            # 设置临时图像文件路径
-            temp_img_path = f"{os.path.splitext(output_path)[0]}_temp.png"
-            
-            # 临时图像优化选项
-            image_optimize_options = {
-                "optimize": True,  # 优化图像存储
-                "compress_level": 6,  # 中等压缩级别
-            }
-            
-            # 使用PIL直接保存图像，保留原始格式和所有信息
-            pil_image.save(temp_img_path, format="PNG", **image_optimize_options)
+            # 源图像以rawvideo格式经stdin交给FFmpeg，不再写出临时PNG再由FFmpeg解码
+            if pil_image.mode not in ("RGB", "RGBA"):
+                has_alpha = pil_image.mode in ("LA", "PA") or "transparency" in pil_image.info
+                pil_image = pil_image.convert("RGBA" if has_alpha else "RGB")
+            source_pix_fmt = "rgba" if pil_image.mode == "RGBA" else "rgb24"
+            source_frame = np.asarray(pil_image)
             
             # 获取图像尺寸
             img_width, img_height = pil_image.size
@@ -1392,13 +2266,8 @@ class VideoRenderer:
             # 滚动距离 = 图像高度 - 视频高度
             scroll_distance = max(0, img_height - self.height)
             
-            # 确保至少有8秒的滚动时间
-            min_scroll_duration = 8.0  # 秒
+            # 确保最短滚动时间（默认8秒），前后各添加静止时间（默认2秒）
             scroll_duration = max(min_scroll_duration, scroll_distance / (self.scroll_speed * self.fps))
-            
-            # 前后各添加2秒静止时间
-            start_static_time = 2.0  # 秒
-            end_static_time = 2.0  # 秒
             total_duration = start_static_time + scroll_duration + end_static_time
             
             # 总帧数
@@ -1419,88 +2288,130 @@ class VideoRenderer:
             )
             
             # 准备阶段结束
-            preparation_end_time = time.time()
+            preparation_end_time = time.monotonic()
             self.performance_stats["preparation_time"] = preparation_end_time - preparation_start_time
             
             # 4. 创建FFmpeg命令，使用crop滤镜和表达式
-            encoding_start_time = time.time()
+            encoding_start_time = time.monotonic()
             
-            # 检查系统是否有支持的GPU加速
-            gpu_support = {
-                "nvidia": False
-            }
-            
-            # 检测NVIDIA GPU
-            try:
-                # 检测NVIDIA GPU是否存在
-                nvidia_result = subprocess.run(['nvidia-smi'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=2)
-                gpu_support["nvidia"] = nvidia_result.returncode == 0
-                
-                if gpu_support["nvidia"]:
-                    logger.info("检测到NVIDIA GPU，将尝试使用NVENC编码器")
-            except Exception as e:
-                logger.info(f"NVIDIA GPU检测出错: {e}，将使用CPU处理")
+            # 不透明视频优先使用可用的硬件编码器（进程内只检测一次）；
+            # 调用方指定了NVENC时即使未检测到也按指定使用
+            hw_encoder = None
+            if not transparency_required and "NO_GPU" not in os.environ:
+                if "libx264" in codec_params or "h264_nvenc" in codec_params:
+                    available_encoders = _probe_hw_encoders()
+                    hw_encoder = next((name for name in _HW_ENCODERS if name in available_encoders), None)
+                if hw_encoder is None and "h264_nvenc" in codec_params:
+                    hw_encoder = "h264_nvenc"
+            if hw_encoder:
+                logger.info(f"使用硬件编码器({hw_encoder})")
+                codec_params, hw_device_args, crop_suffix = _hw_encoder_parameters(hw_encoder, self.encoder_preset)
+            else:
+                logger.info("未检测到可用的硬件编码器或使用透明视频，将使用CPU处理")
+                hw_device_args, crop_suffix = [], ""
             
-            # 检测是否有任何GPU支持
-            has_gpu_support = gpu_support["nvidia"]
+            # CPU编码为yuv420p时，在进程内把源图像一次性转换为yuv420p作为输入，
+            # FFmpeg不再对每个输出帧做RGB→YUV转换，管道传输的数据量也减半。
+            # yuv420p的crop偏移按2行取整，仅在每帧滚动偶数整像素且各尺寸为偶数时使用，避免滚动抖动
+            pixels_per_frame = scroll_distance / (scroll_duration * self.fps)
+            if (
+                hw_encoder is None
+                and source_pix_fmt == "rgb24"
+                and "yuv420p" in codec_params
+                and (scroll_distance == 0 or (abs(pixels_per_frame - round(pixels_per_frame)) < 1e-6 and round(pixels_per_frame) % 2 == 0))
+                and img_width % 2 == 0 and img_height % 2 == 0
+                and self.width % 2 == 0 and self.height % 2 == 0
+            ):
+                source_frame = _rgb_to_yuv420p(source_frame)
+                source_pix_fmt = "yuv420p"
+                logger.info("源图像已转换为yuv420p输入，FFmpeg跳过逐帧的像素格式转换")
             
-            # 构建基本FFmpeg命令
-            ffmpeg_cmd = [
+            # 图像输入参数：整张源图像作为一帧rawvideo从stdin读入，
+            # 格式由命令行完全指定，跳过流分析以缩短启动时间
+            input_args = [
                 "ffmpeg",
                 "-y",
-                "-loop", "1",  # 循环输入图像
-                "-i", temp_img_path,  # 输入图像
-                "-progress", "pipe:2",  # 输出进度信息到stderr
-                "-stats",  # 启用统计信息
-                "-stats_period", "1",  # 每1秒输出一次统计信息
+                *hw_device_args,
+                "-probesize", "32",
+                "-analyzeduration", "0",
+                "-f", "rawvideo",
+                "-pix_fmt", source_pix_fmt,
+                "-s", f"{img_width}x{img_height}",
+                "-framerate", str(self.fps),
+                "-i", "-",
+            ]
+
+            # 构建基本FFmpeg命令
+            # 进度以key=value形式输出；POSIX上启动FFmpeg前改为写入单独的管道，
+            # 监控线程无需从日志中匹配进度（Windows不支持向子进程传递额外的文件描述符，仍写入stderr）
+            progress_arg_index = len(input_args) + 1
+            ffmpeg_cmd = input_args + [
+                "-progress", "pipe:2",  # 输出key=value形式的进度信息
+                "-nostats",  # 不输出stderr上的统计行
+                "-stats_period", "1",  # 每1秒输出一次进度
                 "-max_muxing_queue_size", "1024",  # 限制复用队列大小
             ]
             
             # 添加音频输入（如果有）
-            if audio_path and os.path.exists(audio_path):
+            has_audio = bool(audio_path and os.path.exists(audio_path))
+            if has_audio:
                 ffmpeg_cmd.extend(["-i", audio_path])
                 
-            # 创建裁剪表达式
-            crop_y_expr = f"'if(between(t,{scroll_start_time},{scroll_end_time}),min({img_height-self.height},(t-{scroll_start_time})/{scroll_duration}*{scroll_distance}),if(lt(t,{scroll_start_time}),0,{scroll_distance}))'"
+            # 创建裁剪表达式；分段编码时每段从0开始计时，用时间偏移还原在整段视频中的位置
+            def make_crop_expr(time_offset=0):
+                t = f"(t+{time_offset})" if time_offset else "t"
+                crop_y_expr = f"'if(between({t},{scroll_start_time},{scroll_end_time}),min({img_height-self.height},({t}-{scroll_start_time})/{scroll_duration}*{scroll_distance}),if(lt({t},{scroll_start_time}),0,{scroll_distance}))'"
+                # loop滤镜重复输出这唯一的一帧（引用计数，不复制像素）；
+                # 始终使用CPU的crop滤镜（只调整数据指针，不复制像素），硬件编码时裁剪后再上传到GPU
+                return (
+                    "loop=loop=-1:size=1,"
+                    f"crop=w={self.width}:h={self.height}:"
+                    f"x=0:y={crop_y_expr}"
+                    f"{crop_suffix}"
+                )
             
-            # 始终使用CPU的crop滤镜,GPU没有crop滤镜
-            crop_expr = (
-                f"crop=w={self.width}:h={self.height}:"
-                f"x=0:y={crop_y_expr}"
-            )
+            # 编码器参数中的-vf不能与-filter_complex同时作用于同一路输出，去掉后统一在滤镜链中处理
+            if "-vf" in codec_params:
+                vf_index = codec_params.index("-vf")
+                del codec_params[vf_index:vf_index + 2]
             
-            # 添加滤镜
-            ffmpeg_cmd.extend([
-                "-filter_complex", crop_expr,
-            ])
-            
-            # 基于GPU支持选择合适的编码器
-            if gpu_support["nvidia"] and not transparency_required:
-                # 尝试使用NVENC编码器
-                if "libx264" in ' '.join(codec_params):
-                    logger.info("切换到NVIDIA硬件编码器(h264_nvenc)")
-                    for i, param in enumerate(codec_params):
-                        if param == "libx264":
-                            codec_params[i] = "h264_nvenc"
-                            break
-            else:
-                logger.info("未检测到支持的GPU或使用透明视频，将使用CPU处理")
-                
-            # 添加公共参数
-            ffmpeg_cmd.extend([
-                "-t", str(total_duration),  # 设置总时长
+            # 长视频且CPU核心数足够时，按时间轴分段并行编码（硬件编码器的并发会话数有限，不分段）
+            segment_count = 1
+            if (
+                total_duration > SEGMENT_MIN_DURATION
+                and _CPU_COUNT > 4
+                and hw_encoder is None
+            ):
+                segment_count = min(MAX_PARALLEL_SEGMENTS, _CPU_COUNT // 2)
+
+            # 公共参数和视频编码参数
+            video_args = [
                 "-vsync", "1",  # 添加vsync参数，确保平滑的视频同步
                 "-thread_queue_size", "2048",  # 限制线程队列大小，减少内存使用
-            ])
-            
-            # 添加视频编码参数
-            ffmpeg_cmd.extend(codec_params)
+            ]
+            video_args.extend(codec_params)
+
+            # libx264显式使用全部核心做帧级并行（不启用sliced-threads，
+            # 其面向低延迟，会降低批量编码的吞吐和压缩率）；分段时各进程平分核心
+            if "libx264" in codec_params and "-threads" not in codec_params:
+                encoder_threads = max(1, _CPU_COUNT // segment_count)
+                video_args.extend([
+                    "-threads", str(encoder_threads),
+                    "-x264-params", f"lookahead-threads={max(1, min(encoder_threads // 4, 4))}",
+                ])
+                self.performance_stats["encoder_threads"] = encoder_threads
+                logger.info(f"libx264编码线程数: {encoder_threads}")
             
             # 设置帧率
-            ffmpeg_cmd.extend(["-r", str(self.fps)])
+            video_args.extend(["-r", str(self.fps)])
+
+            # 添加滤镜、总时长和编码参数
+            ffmpeg_cmd.extend(["-filter_complex", make_crop_expr()])
+            ffmpeg_cmd.extend(["-t", str(total_duration)])  # 设置总时长
+            ffmpeg_cmd.extend(video_args)
             
             # 添加音频映射（如果有）
-            if audio_path and os.path.exists(audio_path):
+            if has_audio:
                 ffmpeg_cmd.extend([
                     "-c:a", "aac",
                     "-b:a", "192k",
@@ -1509,76 +2420,121 @@ class VideoRenderer:
                     "-shortest",
                 ])
             
-            # 添加输出路径
-            ffmpeg_cmd.append(output_path)
+            # 先写入输出目录下临时目录中的文件（扩展名不变，FFmpeg按其选择封装格式），
+            # 成功后原子重命名为最终文件，失败时不会留下或覆盖半成品
+            temp_dir = _temp_dir_beside(output_path)
+            partial_output_path = os.path.join(temp_dir.name, "output" + os.path.splitext(output_path)[1])
+            ffmpeg_cmd.append(partial_output_path)
 
             logger.info(f"FFmpeg命令: {' '.join(ffmpeg_cmd)}")
 
             # 5. 执行FFmpeg命令
+            process = None
+            progress_read_fd = progress_write_fd = None
             try:
-                # 启动进程
-                logger.info("启动FFmpeg进程...")
-                process = subprocess.Popen(
-                    ffmpeg_cmd,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True,
-                    bufsize=1,  # 行缓冲
-                    universal_newlines=True  # 使用通用换行符
-                )
+                if segment_count > 1 and self._encode_crop_segments_parallel(
+                    input_args, source_frame, make_crop_expr, video_args, total_frames,
+                    partial_output_path, audio_path, segment_count,
+                ):
+                    os.replace(partial_output_path, output_path)
+                    logger.info("FFmpeg分段处理完成")
+                else:
+                    # 启动进程
+                    logger.info("启动FFmpeg进程...")
+                    if _SYSTEM != "Windows":
+                        progress_read_fd, progress_write_fd = os.pipe()
+                        ffmpeg_cmd[progress_arg_index] = f"pipe:{progress_write_fd}"
+                    process = subprocess.Popen(
+                        ffmpeg_cmd,
+                        stdin=subprocess.PIPE,
+                        stdout=subprocess.DEVNULL,
+                        stderr=subprocess.PIPE,
+                        pass_fds=(progress_write_fd,) if progress_write_fd is not None else (),
+                    )
+                    stderr_tail = deque(maxlen=20)  # 保留最后几行stderr，FFmpeg失败时输出
+                    stderr_thread = None
+                    progress_pipe = None
+                    if progress_write_fd is not None:
+                        # 写端已交给FFmpeg，父进程关闭自己的副本，FFmpeg退出后进度管道即EOF
+                        os.close(progress_write_fd)
+                        progress_write_fd = None
+                        progress_pipe = os.fdopen(progress_read_fd, "rb")
+                        progress_read_fd = None
+                        stderr_thread = threading.Thread(
+                            target=_drain_stderr, args=(process.stderr, stderr_tail), daemon=True
+                        )
+                        stderr_thread.start()
                 
-                # 使用新的进度条监控FFmpeg进度
-                monitor_thread = PerformanceMonitor.monitor_ffmpeg_progress(
-                    process=process,
-                    total_duration=total_duration,
-                    total_frames=total_frames,
-                    encoding_start_time=encoding_start_time
-                )
+                    # 使用新的进度条监控FFmpeg进度，监控线程边读取进度管道边解析进度
+                    monitor_thread = PerformanceMonitor.monitor_ffmpeg_progress(
+                        process=process,
+                        total_duration=total_duration,
+                        total_frames=total_frames,
+                        encoding_start_time=encoding_start_time,
+                        progress_pipe=progress_pipe,
+                        stderr_tail=stderr_tail,
+                    )
+
+                    # 写入源图像后关闭stdin，FFmpeg读到EOF后只循环这一帧
+                    try:
+                        _write_to_pipe(process.stdin.fileno(), source_frame)
+                    except OSError as e:
+                        logger.error(f"写入源图像到FFmpeg失败: {e}")
+                    finally:
+                        process.stdin.close()
                 
-                # 获取输出和错误
-                stdout, stderr = process.communicate()
+                    # 等待FFmpeg结束
+                    process.wait()
                 
-                # 等待监控线程结束
-                if monitor_thread and monitor_thread.is_alive():
-                    monitor_thread.join(timeout=2.0)
+                    # FFmpeg退出后进度管道和stderr随即EOF，读取线程读完剩余输出后自行结束
+                    monitor_thread.join()
+                    if stderr_thread is not None:
+                        stderr_thread.join()
                 
-                # 检查进程返回码
-                if process.returncode != 0:
-                    logger.error(f"FFmpeg处理失败: {stderr}")
-                    raise Exception(f"FFmpeg处理失败，返回码: {process.returncode}")
+                    # 检查进程返回码
+                    if process.returncode != 0:
+                        logger.error(f"FFmpeg处理失败: {_format_tail(stderr_tail)}")
+                        raise Exception(f"FFmpeg处理失败，返回码: {process.returncode}")
                 
-                logger.info("FFmpeg处理完成")
+                    os.replace(partial_output_path, output_path)
+                    logger.info("FFmpeg处理完成")
                 
             except Exception as e:
                 logger.error(f"执行FFmpeg命令时出错: {str(e)}")
                 raise
             finally:
-                # 清理临时文件
-                try:
-                    if os.path.exists(temp_img_path):
-                        os.remove(temp_img_path)
-                except Exception as e:
-                    logger.warning(f"清理临时文件失败: {str(e)}")
-            
-            # 编码结束
-            encoding_end_time = time.time()
-            self.performance_stats["encoding_time"] = encoding_end_time - encoding_start_time
+                # 出错或中断时不留下仍在运行的FFmpeg进程
+                if process is not None:
+                    _stop_process(process)
+                # 未交给读取线程的进度管道端（走分段编码或启动失败时）在此关闭
+                for fd in (progress_read_fd, progress_write_fd):
+                    if fd is not None:
+                        os.close(fd)
+                # 清理临时目录
+                temp_dir.cleanup()
             
-            # 计算总时间
-            self.performance_stats["total_time"] = encoding_end_time - total_start_time
-            
-            # 估算处理的帧数和帧率
-            self.performance_stats["frames_processed"] = total_frames
-            if self.performance_stats["encoding_time"] > 0:
-                self.performance_stats["fps"] = total_frames / self.performance_stats["encoding_time"]
+            # 编码结束：统计编码时间、总时间、帧数和帧率
+            encoding_end_time = time.monotonic()
+            encoding_time = encoding_end_time - encoding_start_time
+            total_time = encoding_end_time - total_start_time
+            fps = total_frames / encoding_time if encoding_time > 1e-6 else 0.0
+            self.performance_stats.update(
+                encoding_time=encoding_time,
+                total_time=total_time,
+                frames_processed=total_frames,
+                fps=fps,
+            )
             
-            # 输出性能统计
-            logger.info("\n" + "="*50)
-            logger.info("滚动视频生成性能统计 (FFmpeg滤镜方式):")
-            logger.info(f"1. 准备阶段: {self.performance_stats['preparation_time']:.2f}秒 ({self.performance_stats['preparation_time']/self.performance_stats['total_time']*100:.1f}%)")
-            logger.info(f"2. FFmpeg编码: {self.performance_stats['encoding_time']:.2f}秒 ({self.performance_stats['encoding_time']/self.performance_stats['total_time']*100:.1f}%)")
-            logger.info(f"总时间: {self.performance_stats['total_time']:.2f}秒, 估算帧率: {self.performance_stats['fps']:.1f}帧/秒")
-            logger.info("="*50 + "\n")
+            # 输出性能统计（INFO级别未启用时跳过占比计算）
+            if logger.isEnabledFor(logging.INFO):
+                denom = total_time if total_time > 1e-6 else 1.0  # 占比计算的分母，避免除零
+                preparation_time = self.performance_stats["preparation_time"]
+                logger.info(
+                    _FFMPEG_STATS_TEMPLATE,
+                    preparation_time, preparation_time / denom * 100,
+                    encoding_time, encoding_time / denom * 100,
+                    total_time, fps,
+                )
             
             return output_path
             
@@ -1586,5 +2542,5 @@ class VideoRenderer:
             logger.error(f"使用FFmpeg滤镜创建滚动视频时出错: {str(e)}")
             logger.error(traceback.format_exc())
             # 记录总时间（即使发生错误）
-            self.performance_stats["total_time"] = time.time() - total_start_time
+            self.performance_stats["total_time"] = time.monotonic() - total_start_time
             raise